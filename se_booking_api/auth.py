@@ -0,0 +1,209 @@
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+
+log = logging.getLogger("se_booking.auth")
+
+# ---------------- PASSWORDS ----------------
+# Stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>". Rows written
+# before hashing hold the plain password; they still verify and are
+# re-hashed on the next successful login.
+
+PBKDF2_ITERATIONS = int(os.getenv("AUTH_PBKDF2_ITERATIONS", "200000"))
+HASH_PREFIX = "pbkdf2_sha256"
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password, iterations=PBKDF2_ITERATIONS):
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{HASH_PREFIX}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(HASH_PREFIX + "$")
+
+
+def verify_password(stored, password):
+    """Check a password against a stored hash (or legacy plain value)."""
+    if not isinstance(stored, str) or not isinstance(password, str):
+        return False
+
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode(), password.encode())
+
+    try:
+        _, iterations, salt, digest = stored.split("$")
+        check = hashlib.pbkdf2_hmac("sha256", password.encode(), _unb64(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(check, _unb64(digest))
+
+
+# ---------------- TOKENS ----------------
+# <base64 claims>.<base64 HMAC-SHA256 of the claims>
+# Verified in memory, no DB lookup. All workers must share AUTH_SECRET
+# (serve.py generates one for its workers when it is unset).
+
+TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", str(12 * 3600)))
+
+SECRET = os.getenv("AUTH_SECRET", "").encode()
+if not SECRET:
+    # A per-process secret would reject tokens issued by the other workers
+    if os.getenv("AUTH_REQUIRED", "0") == "1":
+        raise RuntimeError("AUTH_SECRET must be set when AUTH_REQUIRED=1")
+    SECRET = secrets.token_bytes(32)
+    log.warning("AUTH_SECRET not set; tokens are only valid in this process")
+
+
+def _sign(payload):
+    return _b64(hmac.new(SECRET, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(role, subject, **claims):
+    payload = _b64(json.dumps({
+        "role": role,
+        "sub": subject,
+        "exp": int(time.time()) + TOKEN_TTL,
+        **claims
+    }, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token):
+    """Return the claims of a valid, unexpired token, else None."""
+    try:
+        payload, signature = token.split(".")
+    except (AttributeError, ValueError):
+        return None
+
+    # compare_digest raises on non-ASCII str (headers are decoded as
+    # latin-1), so compare bytes
+    if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        return None
+
+    try:
+        claims = json.loads(_unb64(payload))
+    except ValueError:
+        return None
+
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+# ---------------- MIDDLEWARE ----------------
+# Puts the verified claims (or None) in scope["state"]["auth"]. With
+# AUTH_REQUIRED=1 it also rejects requests to protected paths that lack
+# a token for one of the allowed roles. Off by default until every
+# client sends tokens.
+
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "0") == "1"
+
+PUBLIC_PATHS = {"/admin/login", "/center/login", "/agent/login"}
+
+# (path prefix, roles allowed); first match wins
+PROTECTED = [
+    ("/admin/", {"admin"}),
+    ("/center/", {"center", "admin"}),
+    ("/agent/", {"agent", "admin"}),
+    ("/update_payment_details", {"admin", "center", "agent"}),
+    ("/add_bookings", {"admin", "agent"}),
+]
+
+
+def allowed_roles(path):
+    if path in PUBLIC_PATHS:
+        return None
+    for prefix, roles in PROTECTED:
+        if path.startswith(prefix):
+            return roles
+    return None
+
+
+def _bearer(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return token.strip()
+    return None
+
+
+class AuthMiddleware:
+    def __init__(self, app, required=AUTH_REQUIRED):
+        self.app = app
+        self.required = required
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        token = _bearer(scope)
+        claims = verify_token(token) if token else None
+        scope.setdefault("state", {})["auth"] = claims
+
+        if self.required and scope["method"] != "OPTIONS":
+            roles = allowed_roles(scope["path"])
+            if roles is not None:
+                if claims is None:
+                    return await JSONResponse({"detail": "Not authenticated"}, status_code=401)(scope, receive, send)
+                if claims.get("role") not in roles:
+                    return await JSONResponse({"detail": "Forbidden"}, status_code=403)(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+
+# ---------------- OWNERSHIP ----------------
+# The middleware only checks roles. Handlers call these so a center or
+# agent token reaches its own center's / agent's bookings only. Admin
+# tokens, and requests without a token while AUTH_REQUIRED=0, are not
+# restricted.
+
+def _claims(request):
+    return getattr(request.state, "auth", None) or {}
+
+
+def _id_forms(value):
+    # center ids are stored as int or string
+    if isinstance(value, str):
+        return [value, int(value)] if value.isdigit() else [value]
+    return [value, str(value)]
+
+
+def check_center(request, center_id):
+    claims = _claims(request)
+    if claims.get("role") == "center" and str(claims.get("center_id")) != str(center_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def check_agent(request, agent_name):
+    claims = _claims(request)
+    if claims.get("role") == "agent" and claims.get("agent_name") != agent_name:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def booking_filter(request):
+    """Conditions to add to a booking lookup by id, so another center's or
+    agent's booking is not found."""
+    claims = _claims(request)
+    if claims.get("role") == "center":
+        return {"center_id": {"$in": _id_forms(claims.get("center_id"))}}
+    if claims.get("role") == "agent":
+        return {"booked_by": claims.get("agent_name")}
+    return {}
@@ -0,0 +1,182 @@
+"""Replay captured traffic against a local API and report latency per route.
+
+    # capture on the server (see capture.py)
+    TRAFFIC_CAPTURE=traces/capture-{pid}.jsonl uvicorn main:app
+
+    # replay at 1x, 2x and 10x the captured rate
+    python bench/replay.py traces/*.jsonl --url http://127.0.0.1:8000 \\
+        --mongo-url mongodb://localhost:27017 --db se_booking_bench --speed 1 2 10
+
+Requests keep their captured spacing, divided by --speed, and are sent
+without waiting for earlier ones (open loop). Anonymized values are
+mapped onto real values of the same field in the target database
+(booking ids, mobiles, agent names, login usernames), the same capture
+value always to the same local value. Logins only succeed with
+--password, e.g. the password bench/suite.py seeds.
+
+Writes are replayed too: point it at a throwaway database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo import MongoClient
+from suite import percentile
+
+import httpx
+
+LOGIN_USERS = {
+    "/admin/login": "admins",
+    "/center/login": "center_users",
+    "/agent/login": "agents",
+}
+
+
+def load_records(paths):
+    records = []
+    for path in paths:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def load_pools(db):
+    agents = [a["name"] for a in db.agents.find({}, {"_id": 0, "name": 1}) if a.get("name")]
+    pools = {
+        "booking_id": [b["booking_id"] for b in db.bookings.find({}, {"_id": 0, "booking_id": 1}).limit(10000)],
+        "mobile": db.bookings.distinct("mobile")[:10000],
+        "agent_name": agents,
+        "booked_by": agents,
+        "updated_by_name": agents,
+    }
+    for route, coll in LOGIN_USERS.items():
+        pools[route] = [u["username"] for u in db[coll].find({}, {"_id": 0, "username": 1})]
+    return {k: v for k, v in pools.items() if v}
+
+
+class Resolver:
+    def __init__(self, pools, password=None):
+        self.pools = pools
+        self.password = password
+
+    def value(self, value, key, route):
+        if not (isinstance(value, str) and value.startswith("anon:")):
+            return value
+        if key == "password" and self.password:
+            return self.password
+
+        pool = self.pools.get(route if key == "username" else key)
+        if not pool:
+            return value
+        return pool[int(value[5:], 16) % len(pool)]
+
+    def resolve(self, value, route, key=None):
+        if isinstance(value, dict):
+            return {k: self.resolve(v, route, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.resolve(v, route, key) for v in value]
+        return self.value(value, key, route)
+
+
+async def replay(records, base_url, speed, resolver, token, max_inflight, timeout):
+    stats = {}
+    lag = 0.0
+    inflight = asyncio.Semaphore(max_inflight)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout,
+                                 limits=httpx.Limits(max_connections=max_inflight)) as client:
+
+        async def send(r):
+            body = r.get("body")
+            if isinstance(body, dict) and "$size" in body:
+                body = None
+
+            s = stats.setdefault((r["method"], r["route"]), {"ms": [], "captured": [], "errors": 0, "4xx": 0})
+            start = time.perf_counter()
+            try:
+                res = await client.request(
+                    r["method"], r["route"],
+                    params=resolver.resolve(r.get("params") or {}, r["route"]),
+                    json=resolver.resolve(body, r["route"]) if body is not None else None,
+                    headers=headers if r.get("role") else {},
+                )
+                await res.aread()
+                if res.status_code >= 500:
+                    s["errors"] += 1
+                elif res.status_code >= 400:
+                    s["4xx"] += 1
+            except httpx.HTTPError:
+                s["errors"] += 1
+            finally:
+                inflight.release()
+            s["ms"].append((time.perf_counter() - start) * 1000)
+            if r.get("ms") is not None:
+                s["captured"].append(r["ms"])
+
+        tasks = []
+        t0 = records[0]["ts"]
+        start = time.perf_counter()
+        for r in records:
+            due = (r["ts"] - t0) / speed
+            wait = due - (time.perf_counter() - start)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await inflight.acquire()
+            lag = max(lag, time.perf_counter() - start - due)
+            tasks.append(asyncio.create_task(send(r)))
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return stats, elapsed, lag
+
+
+def report(stats, elapsed, lag, speed, count):
+    print(f"\n{speed}x: {count} requests in {elapsed:.1f}s ({count / elapsed:.1f} req/s), max send lag {lag * 1000:.0f} ms")
+    print(f"{'route':<34} {'n':>6} {'5xx':>5} {'4xx':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'captured p50':>13}")
+    for (method, route), s in sorted(stats.items(), key=lambda item: -len(item[1]["ms"])):
+        ms = sorted(s["ms"])
+        captured = sorted(s["captured"])
+        print(f"{method + ' ' + route:<34} {len(ms):>6} {s['errors']:>5} {s['4xx']:>5} "
+              f"{percentile(ms, 50):>9.2f} {percentile(ms, 95):>9.2f} {percentile(ms, 99):>9.2f} "
+              f"{percentile(captured, 50):>13.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="+")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL"), help="to map anonymized values")
+    parser.add_argument("--db", default=os.getenv("MONGO_DB", "se_booking_bench"))
+    parser.add_argument("--password", help="password of the seeded users, for logins")
+    parser.add_argument("--token", default=os.getenv("REPLAY_TOKEN"), help="bearer token for authenticated requests")
+    parser.add_argument("--max-inflight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    records = load_records(args.captures)
+    if not records:
+        sys.exit("no requests in the capture files")
+
+    pools = load_pools(MongoClient(args.mongo_url)[args.db]) if args.mongo_url else {}
+    resolver = Resolver(pools, args.password)
+
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"{len(records)} captured requests over {span:.0f}s")
+    for speed in args.speed:
+        stats, elapsed, lag = asyncio.run(
+            replay(records, args.url, speed, resolver, args.token, args.max_inflight, args.timeout)
+        )
+        report(stats, elapsed, lag, speed, len(records))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""CPU cost vs bytes saved by response compression, per endpoint.
+
+    python bench/response_compression.py                 # synthetic payloads
+    python bench/response_compression.py http://host:8000 [agent_name] [center_id]
+
+With a base URL the bodies are fetched (uncompressed) from a running
+API; otherwise they are built like serialization.py does.
+"""
+import os
+import sys
+import time
+import urllib.request
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serialization import make_rows
+
+import response_compression
+import responses
+
+AGENT_FIELDS = [
+    "booking_id", "patient_name", "mobile", "test_name", "center_name", "price",
+    "status", "created_at", "payment_status", "payment_updated_by",
+    "agent_collected", "center_collected",
+]
+
+
+def synthetic_bodies(n=10000):
+    rows = make_rows(n)
+    agent_rows = [{k: r[k] for k in AGENT_FIELDS} for r in rows]
+    return {
+        "/admin/bookings": responses.dumps(rows),
+        # Streamed in batches, each flushed on its own like the middleware does
+        "/admin/bookings?stream=1": [
+            b"".join(responses.dumps(r) + b"\n" for r in rows[i:i + 500])
+            for i in range(0, len(rows), 500)
+        ],
+        "/agent/bookings": responses.dumps(agent_rows),
+        "/admin/tests": responses.dumps([
+            {"id": i, "category_id": i % 12, "test_name": f"Test {i}"} for i in range(300)
+        ]),
+    }
+
+
+def fetch_bodies(base, agent_name, center_id):
+    paths = [
+        "/admin/bookings",
+        "/admin/bookings?stream=1",
+        f"/agent/bookings?agent_name={agent_name}",
+        f"/center/bookings?center_id={center_id}",
+        "/admin/tests",
+        "/admin/categories",
+        "/get_notice",
+    ]
+    token = os.getenv("BENCH_TOKEN")
+    bodies = {}
+    for path in paths:
+        req = urllib.request.Request(base.rstrip("/") + path, headers={"Accept-Encoding": "identity"})
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        with urllib.request.urlopen(req) as res:
+            bodies[path] = res.read()
+    return bodies
+
+
+def compressors():
+    yield "gzip-1", lambda: response_compression._Gzip(1)
+    yield "gzip-6", lambda: response_compression._Gzip(6)
+    yield "gzip-9", lambda: response_compression._Gzip(9)
+    if response_compression.brotli is not None:
+        yield "br-4", lambda: response_compression._Brotli(4)
+        yield "br-9", lambda: response_compression._Brotli(9)
+
+
+def measure(make, chunks, repeats=3):
+    best = float("inf")
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        c = make()
+        size = sum(len(c.chunk(chunk)) for chunk in chunks[:-1]) + len(c.finish(chunks[-1]))
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, size
+
+
+def main():
+    if len(sys.argv) > 1:
+        agent_name = sys.argv[2] if len(sys.argv) > 2 else "agent"
+        center_id = sys.argv[3] if len(sys.argv) > 3 else "1"
+        bodies = fetch_bodies(sys.argv[1], agent_name, center_id)
+    else:
+        bodies = synthetic_bodies()
+
+    print(f"{'endpoint':<34} {'codec':<7} {'raw KiB':>9} {'out KiB':>9} {'saved':>6} {'ms':>8} {'MB/s':>7}")
+    for path, chunks in bodies.items():
+        if isinstance(chunks, bytes):
+            chunks = [chunks]
+        raw = sum(len(chunk) for chunk in chunks)
+        for name, make in compressors():
+            ms, size = measure(make, chunks)
+            saved = 1 - size / raw if raw else 0
+            rate = raw / 1e6 / (ms / 1000) if ms else 0
+            print(f"{path:<34} {name:<7} {raw / 1024:9.0f} {size / 1024:9.0f} {saved:6.0%} {ms:8.2f} {rate:7.0f}")
+
+    print(f"(zlib {zlib.ZLIB_VERSION}; brotli {'installed' if response_compression.brotli else 'not installed'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Serialization cost of /admin/bookings per 10k rows.
+
+    python bench/serialization.py [rows] [repeats]
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps), the
+response-model path (pydantic dump_json) and responses.dumps (orjson
+when installed). No database needed.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from schemas import AdminBooking
+from typing import List
+
+import json
+import responses
+
+
+def make_rows(n):
+    rnd = random.Random(42)
+    now = int(time.time())
+    statuses = ["Paid", "Unpaid", "Partial"]
+    return [{
+        "booking_id": f"BKG{1000000 + i}",
+        "patient_name": f"Patient {i}",
+        "mobile": str(9000000000 + rnd.randrange(10 ** 9)),
+        "age": rnd.randrange(1, 90),
+        "gender": rnd.choice(["Male", "Female"]),
+        "address": f"{rnd.randrange(1, 500)} Main Road",
+        "test_name": f"Test {rnd.randrange(300)}",
+        "center_name": f"Center {rnd.randrange(40)}",
+        "status": rnd.choice(["Pending", "Done"]),
+        "created_at": now - rnd.randrange(90 * 86400),
+        "booked_by": rnd.choice(["admin", "agent1", "agent2"]),
+        "payment_status": rnd.choice(statuses),
+        "payment_updated_by": None,
+        "payment_updated_at": None,
+        "agent_collected": rnd.choice([0, 100, 250.5]),
+        "center_collected": 0,
+        "admin_collected": 0,
+        "price": rnd.choice([300, 450, 999.0]),
+    } for i in range(n)]
+
+
+def bench(name, fn, rows, repeats):
+    fn(rows)  # warm up
+    best = float("inf")
+    size = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        size = len(fn(rows))
+        best = min(best, time.perf_counter() - start)
+    per_10k = best * 1000 * 10000 / len(rows)
+    print(f"{name:<34} {per_10k:9.2f} ms/10k  {size / 1024:9.0f} KiB")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = make_rows(n)
+    adapter = TypeAdapter(List[AdminBooking])
+
+    def default(rows):
+        return json.dumps(jsonable_encoder(rows), ensure_ascii=False, separators=(",", ":")).encode()
+
+    def response_model(rows):
+        return adapter.dump_json(adapter.validate_python(rows))
+
+    print(f"{n} rows, best of {repeats}, orjson={'yes' if responses.orjson else 'no'}")
+    bench("jsonable_encoder + json.dumps", default, rows, repeats)
+    bench("pydantic validate + dump_json", response_model, rows, repeats)
+    bench("responses.dumps", responses.dumps, rows, repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+"""Benchmark suite: seed synthetic data, drive every route, report latency.
+
+    pip install -r bench/requirements.txt
+
+    # throwaway mongod with its data dir in /dev/shm (mongod on PATH or MONGOD_BIN)
+    python bench/suite.py --scale 10k --ephemeral
+
+    # local mongod; seeds MONGO_DB (default se_booking_bench), never se_booking
+    python bench/suite.py --scale 100k --mongo-url mongodb://localhost:27017
+
+    # save a baseline, then compare a change against it
+    python bench/suite.py --scale 100k --ephemeral --out base.json
+    python bench/suite.py --scale 100k --ephemeral --baseline base.json
+
+The API runs as a uvicorn subprocess against the seeded database (or
+pass --url to drive one that is already running on the same database).
+Each route gets --requests calls from --concurrency clients, reads
+first and writes after. Routes that return every booking, and the
+logins (PBKDF2), get --heavy-requests calls instead.
+Data is generated from --seed, so runs at the same scale are comparable.
+The booking id generator's throughput (one thread, several threads, and
+inserts into a unique index) is measured before seeding.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from pymongo import MongoClient
+
+import auth
+import httpx
+import ids
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+CATEGORIES = 12
+TESTS = 300
+CENTERS = 40
+AGENTS = 20
+MOBILES = 50_000
+DAYS = 180
+INSERT_BATCH = 10_000
+
+PASSWORD = "bench-password"
+
+
+# ---------------- SYNTHETIC DATA ----------------
+
+def _catalog(rnd):
+    categories = [{"id": i, "name": f"Category {i}"} for i in range(1, CATEGORIES + 1)]
+    tests = [{
+        "id": 1000 + i,
+        "category_id": rnd.randint(1, CATEGORIES),
+        "test_name": f"Test {i:03d} {rnd.choice(['Profile', 'Panel', 'Screen', 'Count'])}",
+    } for i in range(TESTS)]
+    centers = [{
+        "id": 100 + i,
+        "center_name": f"Center {i}",
+        "address": f"{rnd.randint(1, 500)} Main Road, Ward {i}",
+        "lat": round(rnd.uniform(12.8, 13.2), 6),
+        "lng": round(rnd.uniform(77.4, 77.8), 6),
+        "timings": ["07:00-13:00", "16:00-20:00"],
+        "enabled": rnd.random() > 0.1,
+    } for i in range(CENTERS)]
+    prices = [{
+        "center_id": c["id"],
+        "test_id": t["id"],
+        "price": float(rnd.randrange(150, 5000, 50)),
+        "enabled": rnd.random() > 0.1,
+    } for c in centers for t in tests if rnd.random() < 0.6]
+    return categories, tests, centers, prices
+
+
+def _users(centers):
+    password = auth.hash_password(PASSWORD)
+    admins = [{"username": "bench_admin", "password": password}]
+    center_users = [{"center_id": c["id"], "username": f"center{c['id']}", "password": password} for c in centers]
+    agents = [{
+        "name": f"Agent {i}",
+        "username": f"agent{i}",
+        "password": password,
+        "created_at": int(time.time()),
+    } for i in range(AGENTS)]
+    return admins, center_users, agents
+
+
+def _bookings(rnd, n, prices, now):
+    enabled = [p for p in prices if p["enabled"]]
+    booked_by = [f"Agent {i}" for i in range(AGENTS)] + ["Customer", "Center"]
+
+    for _ in range(n):
+        p = rnd.choice(enabled)
+        by = rnd.choice(booked_by)
+        paid = rnd.choice([0, 0, p["price"] / 2, p["price"]])
+        agent_collected = paid if by not in ("Customer", "Center") else 0.0
+        center_collected = paid if by == "Center" else 0.0
+        status = "Paid" if paid >= p["price"] else "Partial" if paid else "Unpaid"
+        created_at = now - rnd.randrange(DAYS * 86400)
+
+        yield {
+            "booking_id": ids.new_booking_id(),
+            "patient_name": f"Patient {rnd.randrange(10 ** 6)}",
+            "mobile": str(9000000000 + rnd.randrange(MOBILES)),
+            "age": rnd.randint(1, 90),
+            "gender": rnd.choice(["Male", "Female"]),
+            "address": f"{rnd.randint(1, 900)} Cross Road",
+            "center_id": p["center_id"],
+            "test_id": p["test_id"],
+            "price": p["price"],
+            "status": rnd.choice(["Pending", "Done"]),
+            "created_at": created_at,
+            "booked_by": by,
+            "agent_collected": agent_collected,
+            "center_collected": center_collected,
+            "payment_status": status,
+            "payment_updated_by": by if paid else None,
+            "payment_updated_at": created_at if paid else None,
+        }
+
+
+def seed(db, n, seed_value):
+    """Drop and refill every collection the API uses."""
+    rnd = random.Random(seed_value)
+    categories, tests, centers, prices = _catalog(rnd)
+    admins, center_users, agents = _users(centers)
+
+    for name in db.list_collection_names():
+        db[name].drop()
+
+    db.categories.insert_many(categories)
+    db.tests.insert_many(tests)
+    db.centers.insert_many(centers)
+    db.prices.insert_many(prices)
+    db.admins.insert_many(admins)
+    db.center_users.insert_many(center_users)
+    db.agents.insert_many(agents)
+    db.notices.insert_one({"id": "home_notice", "text": "Fasting required for lipid tests", "enabled": True})
+
+    start = time.perf_counter()
+    batch = []
+    for b in _bookings(rnd, n, prices, int(time.time())):
+        batch.append(b)
+        if len(batch) == INSERT_BATCH:
+            db.bookings.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.bookings.insert_many(batch, ordered=False)
+    print(f"seeded {n} bookings in {time.perf_counter() - start:.1f}s")
+
+
+def check_ids(n, threads=8):
+    """Burst-generate booking ids on one and on several threads: all unique
+    and increasing per thread."""
+    start = time.perf_counter()
+    generated = [ids.next_id() for _ in range(n)]
+    elapsed = time.perf_counter() - start
+    ok = all(a < b for a, b in zip(generated, generated[1:]))
+    print(f"ids: {n} in {elapsed * 1000:.0f} ms ({n / elapsed:,.0f}/s), unique and increasing: {ok}")
+
+    per_thread = n // threads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        batches = list(pool.map(lambda _: [ids.next_id() for _ in range(per_thread)], range(threads)))
+    elapsed = time.perf_counter() - start
+    flat = [i for batch in batches for i in batch]
+    threaded_ok = len(set(flat)) == len(flat) and all(
+        a < b for batch in batches for a, b in zip(batch, batch[1:]))
+    print(f"ids: {len(flat)} on {threads} threads in {elapsed * 1000:.0f} ms "
+          f"({len(flat) / elapsed:,.0f}/s), unique and increasing: {threaded_ok}")
+    return ok and threaded_ok
+
+
+def check_id_inserts(db, n=16_000, threads=8, batch=100):
+    """Insert freshly generated ids from several threads into a unique index."""
+    coll = db.bench_ids
+    coll.drop()
+    coll.create_index("id", unique=True)
+
+    def insert(_):
+        for _ in range(n // threads // batch):
+            coll.insert_many([{"id": ids.next_id()} for _ in range(batch)], ordered=False)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(insert, range(threads)))
+    elapsed = time.perf_counter() - start
+    count = coll.count_documents({})
+    coll.drop()
+    print(f"id inserts: {count} on {threads} threads in {elapsed * 1000:.0f} ms ({count / elapsed:,.0f}/s)")
+
+
+# ---------------- ROUTES ----------------
+# (name, method, path, build(rnd, ctx) -> (params, json), kind)
+# kind: "read", "write", or "heavy" (uses --heavy-requests)
+
+def _booking(rnd, ctx):
+    p = rnd.choice(ctx["prices"])
+    return {
+        "name": "Bench Patient",
+        "mobile": rnd.choice(ctx["mobiles"]),
+        "age": 40,
+        "gender": "Female",
+        "address": "Bench Road",
+        "center_id": p["center_id"],
+        "test_id": p["test_id"],
+        "price": p["price"],
+        "booked_by": rnd.choice(ctx["agents"])["name"],
+        "paid_amount": 0,
+    }
+
+
+def _unique(ctx, prefix):
+    ctx["counter"] += 1
+    return f"{prefix} {ctx['run']}-{ctx['counter']}"
+
+
+def _typed(rnd, ctx):
+    """What a user has typed so far of some test name."""
+    name = rnd.choice(ctx["tests"])["test_name"]
+    return name[:rnd.randint(1, len(name))]
+
+
+def _window(ctx, days=30):
+    now = int(time.time())
+    return {"start_ts": now - days * 86400, "end_ts": now}
+
+
+ROUTES = [
+    ("home", "GET", "/", lambda rnd, ctx: ({}, None), "read"),
+    ("get_notice", "GET", "/get_notice", lambda rnd, ctx: ({}, None), "read"),
+    ("get_tests", "GET", "/get_tests",
+     lambda rnd, ctx: ({"category_id": rnd.randint(1, CATEGORIES)}, None), "read"),
+    ("get_centers", "GET", "/get_centers",
+     lambda rnd, ctx: ({"test_id": rnd.choice(ctx["tests"])["id"], "sort": "price"}, None), "read"),
+    ("search_tests", "GET", "/search_tests",
+     lambda rnd, ctx: ({"q": _typed(rnd, ctx), "with_price": "true"}, None), "read"),
+    ("center_stats", "GET", "/admin/center_stats", lambda rnd, ctx: ({}, None), "read"),
+    ("center_stats_30d", "GET", "/admin/center_stats", lambda rnd, ctx: (_window(ctx), None), "read"),
+    ("center_stats_weekly", "GET", "/admin/center_stats",
+     lambda rnd, ctx: ({**_window(ctx, 90), "granularity": "week"}, None), "read"),
+    ("bookings_by_mobile", "GET", "/bookings_by_mobile",
+     lambda rnd, ctx: ({"mobile": rnd.choice(ctx["mobiles"])}, None), "read"),
+    ("admin_centers", "GET", "/admin/centers", lambda rnd, ctx: ({}, None), "read"),
+    ("admin_tests", "GET", "/admin/tests", lambda rnd, ctx: ({}, None), "read"),
+    ("admin_pricing", "GET", "/admin/pricing",
+     lambda rnd, ctx: ({"center_id": rnd.choice(ctx["centers"])["id"]}, None), "read"),
+    ("admin_center_users", "GET", "/admin/center_users", lambda rnd, ctx: ({}, None), "read"),
+    ("admin_categories", "GET", "/admin/categories", lambda rnd, ctx: ({}, None), "read"),
+    ("admin_agents", "GET", "/admin/agents", lambda rnd, ctx: ({}, None), "read"),
+
+    ("center_bookings", "GET", "/center/bookings",
+     lambda rnd, ctx: ({"center_id": rnd.choice(ctx["centers"])["id"]}, None), "heavy"),
+    ("agent_bookings", "GET", "/agent/bookings",
+     lambda rnd, ctx: ({"agent_name": rnd.choice(ctx["agents"])["name"]}, None), "heavy"),
+    ("agent_bookings_stream", "GET", "/agent/bookings",
+     lambda rnd, ctx: ({"agent_name": rnd.choice(ctx["agents"])["name"], "stream": 1}, None), "heavy"),
+    ("admin_bookings", "GET", "/admin/bookings", lambda rnd, ctx: ({}, None), "heavy"),
+    ("admin_bookings_stream", "GET", "/admin/bookings", lambda rnd, ctx: ({"stream": 1}, None), "heavy"),
+    # the usual admin view: today, pending, one center
+    ("admin_bookings_filtered", "GET", "/admin/bookings",
+     lambda rnd, ctx: ({**_window(ctx, 1), "center_id": rnd.choice(ctx["centers"])["id"], "status": "Pending"}, None),
+     "read"),
+    ("admin_login", "POST", "/admin/login",
+     lambda rnd, ctx: ({}, {"username": "bench_admin", "password": PASSWORD}), "heavy"),
+    ("center_login", "POST", "/center/login",
+     lambda rnd, ctx: ({}, {"username": f"center{rnd.choice(ctx['centers'])['id']}", "password": PASSWORD}), "heavy"),
+    ("agent_login", "POST", "/agent/login",
+     lambda rnd, ctx: ({}, {"username": rnd.choice(ctx["agents"])["username"], "password": PASSWORD}), "heavy"),
+
+    ("add_booking", "POST", "/add_booking", lambda rnd, ctx: ({}, _booking(rnd, ctx)), "write"),
+    ("add_bookings", "POST", "/add_bookings",
+     lambda rnd, ctx: ({}, [_booking(rnd, ctx) for _ in range(20)]), "write"),
+    ("update_payment_details", "POST", "/update_payment_details",
+     lambda rnd, ctx: ({}, {"booking_id": rnd.choice(ctx["booking_ids"]),
+                            "agent_collected": 100, "updated_by_name": "bench"}), "write"),
+    ("update_payment_status", "POST", "/center/update_payment_status",
+     lambda rnd, ctx: ({}, {"booking_id": rnd.choice(ctx["booking_ids"]), "payment_status": "Paid"}), "write"),
+    ("mark_done", "POST", "/center/mark_done",
+     lambda rnd, ctx: ({}, {"booking_id": rnd.choice(ctx["booking_ids"])}), "write"),
+    ("update_notice", "POST", "/admin/update_notice",
+     lambda rnd, ctx: ({}, {"text": "Fasting required for lipid tests", "enabled": True}), "write"),
+    ("set_price", "POST", "/admin/set_price",
+     lambda rnd, ctx: ({}, dict(rnd.choice(ctx["prices"]))), "write"),
+    ("update_center", "POST", "/admin/update_center",
+     lambda rnd, ctx: ({}, dict(rnd.choice(ctx["centers"]))), "write"),
+    ("toggle_center", "POST", "/admin/toggle_center",
+     lambda rnd, ctx: ({}, {"center_id": rnd.choice(ctx["centers"])["id"], "enabled": True}), "write"),
+    ("update_test", "POST", "/admin/update_test",
+     lambda rnd, ctx: ({}, (lambda t: {"test_id": t["id"], "test_name": t["test_name"]})(rnd.choice(ctx["tests"]))), "write"),
+    ("add_test", "POST", "/admin/add_test",
+     lambda rnd, ctx: ({}, {"category_id": rnd.randint(1, CATEGORIES), "test_name": _unique(ctx, "Bench Test")}), "write"),
+    ("add_category", "POST", "/admin/add_category",
+     lambda rnd, ctx: ({}, {"name": _unique(ctx, "Bench Category")}), "write"),
+    ("add_center", "POST", "/admin/add_center",
+     lambda rnd, ctx: ({}, {"id": ids.next_id(), "center_name": _unique(ctx, "Bench Center"), "address": "Bench Road"}), "write"),
+    ("create_center_user", "POST", "/admin/create_center_user",
+     lambda rnd, ctx: ({}, {"center_id": rnd.choice(ctx["centers"])["id"],
+                            "username": _unique(ctx, "bench-center"), "password": PASSWORD}), "heavy"),
+    ("update_center_user", "POST", "/admin/update_center_user",
+     lambda rnd, ctx: ({}, (lambda c: {"center_id": c["id"], "username": f"center{c['id']}",
+                                       "password": PASSWORD})(rnd.choice(ctx["centers"]))), "heavy"),
+    ("add_agent", "POST", "/admin/add_agent",
+     lambda rnd, ctx: ({}, {"name": _unique(ctx, "Bench Agent"), "username": _unique(ctx, "bench-agent"),
+                            "password": PASSWORD}), "heavy"),
+    ("update_agent", "POST", "/admin/update_agent",
+     lambda rnd, ctx: ({}, (lambda a: {"username": a["username"], "name": a["name"],
+                                       "password": PASSWORD})(rnd.choice(ctx["agents"]))), "heavy"),
+]
+
+
+def load_context(db, seed_value):
+    """What the route builders pick from, read back from the database."""
+    return {
+        "run": seed_value,
+        "counter": int(time.time()),
+        "tests": list(db.tests.find({}, {"_id": 0, "id": 1, "test_name": 1}).limit(TESTS)),
+        "centers": list(db.centers.find({"enabled": True}, {"_id": 0}).limit(CENTERS)),
+        "prices": list(db.prices.find({"enabled": True}, {"_id": 0})),
+        "agents": list(db.agents.find({"username": {"$regex": "^agent"}}, {"_id": 0, "name": 1, "username": 1})),
+        "mobiles": db.bookings.distinct("mobile", {"created_at": {"$gte": int(time.time()) - 30 * 86400}})[:5000],
+        "booking_ids": [b["booking_id"] for b in db.bookings.find({}, {"_id": 0, "booking_id": 1}).limit(5000)],
+    }
+
+
+# ---------------- LOAD GENERATOR ----------------
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+async def run_route(client, route, ctx, requests, concurrency, rnd):
+    name, method, path, build, _ = route
+    latencies = []
+    errors = 0
+    created_ids = []
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            params, body = build(rnd, ctx)
+            start = time.perf_counter()
+            try:
+                res = await client.request(method, path, params=params, json=body)
+                await res.aread()
+                ok = res.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+            elif name == "add_booking":
+                created_ids.append(res.json()["booking_id"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        "route": name,
+        "path": path,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+    }
+    if created_ids and len(set(created_ids)) != len(created_ids):
+        result["duplicate_booking_ids"] = len(created_ids) - len(set(created_ids))
+    return result
+
+
+async def run_load(base_url, ctx, args):
+    rnd = random.Random(args.seed)
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        login = await client.post("/admin/login", json={"username": "bench_admin", "password": PASSWORD})
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['token']}"
+
+        await check_coverage(client)
+
+        # Reads run against the seeded data, before any write changes it
+        order = [r for r in ROUTES if r[4] != "write"] + [r for r in ROUTES if r[4] == "write"]
+        results = []
+        for route in order:
+            if args.routes and not any(f in route[0] for f in args.routes):
+                continue
+            heavy = route[4] == "heavy"
+            requests = args.heavy_requests if heavy else args.requests
+            concurrency = min(args.concurrency, 4) if heavy else args.concurrency
+            result = await run_route(client, route, ctx, requests, concurrency, rnd)
+            print_row(result)
+            results.append(result)
+        return results
+
+
+async def check_coverage(client):
+    """Warn about routes in the API that ROUTES does not drive."""
+    spec = (await client.get("/openapi.json")).json()
+    driven = {(method, path) for _, method, path, _, _ in ROUTES}
+    for path, methods in spec.get("paths", {}).items():
+        for method in methods:
+            if (method.upper(), path) not in driven:
+                print(f"warning: {method.upper()} {path} is not benchmarked")
+
+
+# ---------------- REPORT ----------------
+
+HEADER = f"{'route':<26} {'n':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}"
+
+
+def print_row(r):
+    print(f"{r['route']:<26} {r['requests']:>6} {r['errors']:>5} "
+          f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['rps']:>8.1f}"
+          + (f"  DUPLICATE IDS: {r['duplicate_booking_ids']}" if "duplicate_booking_ids" in r else ""))
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {r["route"]: r for r in json.load(f)["results"]}
+
+    print(f"\nvs {baseline_path}")
+    print(f"{'route':<26} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9}")
+    for r in results:
+        b = baseline.get(r["route"])
+        if not b:
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            cells.append(f"{(r[key] / b[key] - 1) * 100:+8.1f}%" if b[key] else f"{'-':>9}")
+        print(f"{r['route']:<26} " + " ".join(cells))
+
+
+# ---------------- PROCESSES ----------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until(check, timeout, what):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if check():
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    sys.exit(f"{what} did not come up within {timeout}s")
+
+
+def start_mongod():
+    binary = os.getenv("MONGOD_BIN") or shutil.which("mongod")
+    if not binary:
+        sys.exit("mongod not found: put it on PATH, set MONGOD_BIN, or pass --mongo-url")
+
+    # /dev/shm keeps the data files in memory where it exists
+    dbpath = tempfile.mkdtemp(prefix="se-bench-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    port = free_port()
+    proc = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"mongodb://127.0.0.1:{port}"
+    wait_until(lambda: MongoClient(url, serverSelectionTimeoutMS=500).admin.command("ping"), 30, "mongod")
+    return proc, dbpath, url
+
+
+def start_api(mongo_url, db_name):
+    port = free_port()
+    env = {**os.environ, "MONGO_URL": mongo_url, "MONGO_DB": db_name}
+    env.setdefault("AUTH_SECRET", "bench")
+    # As serve.py does: stats rollups are built before the API starts, so
+    # a long backfill doesn't count against the startup wait
+    subprocess.run([sys.executable, "rollups.py", "--backfill"], cwd=API_DIR, env=env, check=True)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=API_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    # Warmup builds indexes; at 1M bookings that takes a while
+    wait_until(lambda: httpx.get(url + "/ready").status_code == 200, 600, "API")
+    return proc, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="10k", help="10k, 100k, 1m or a booking count")
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL"))
+    parser.add_argument("--ephemeral", action="store_true", help="start a throwaway mongod")
+    parser.add_argument("--db", default=os.getenv("MONGO_DB", "se_booking_bench"))
+    parser.add_argument("--url", help="drive an API that is already running")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data from a previous run")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--heavy-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--routes", nargs="*", help="only routes whose name contains one of these")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare with a previous --out file")
+    args = parser.parse_args()
+
+    n = SCALES.get(args.scale.lower()) or int(args.scale)
+    if args.db == "se_booking":
+        sys.exit("refusing to seed the production database name; pick another --db")
+
+    processes = []
+    dbpath = None
+    try:
+        if args.ephemeral:
+            mongod, dbpath, args.mongo_url = start_mongod()
+            processes.append(mongod)
+        if not args.mongo_url:
+            sys.exit("pass --mongo-url or --ephemeral")
+
+        db = MongoClient(args.mongo_url)[args.db]
+        if not check_ids(200_000):
+            sys.exit("booking id generator produced duplicates")
+        check_id_inserts(db)
+        if not args.no_seed:
+            seed(db, n, args.seed)
+        ctx = load_context(db, args.seed)
+
+        if args.url:
+            base_url = args.url
+        else:
+            api, base_url = start_api(args.mongo_url, args.db)
+            processes.append(api)
+
+        print(f"\n{n} bookings, {args.concurrency} clients\n{HEADER}")
+        results = asyncio.run(run_load(base_url, ctx, args))
+
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump({"scale": n, "args": vars(args), "results": results}, f, indent=2)
+        if args.baseline:
+            compare(results, args.baseline)
+    finally:
+        for proc in reversed(processes):
+            proc.terminate()
+            proc.wait()
+        if dbpath:
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+from urllib.parse import parse_qsl
+
+import hashlib
+import json
+import os
+import random
+import secrets
+import threading
+import time
+
+# ---------------- TRAFFIC CAPTURE ----------------
+# Opt-in: TRAFFIC_CAPTURE=traces/capture-{pid}.jsonl writes one JSON line
+# per request (route, params, body shape, status, timing) for
+# bench/replay.py. TRAFFIC_CAPTURE_SAMPLE=0.1 keeps one request in ten.
+#
+# Nothing personal is written. Values of the keys in KEEP are copied;
+# every other string (names, mobiles, passwords, booking ids, ...) is
+# replaced by "anon:<hash>". The hash is salted per process, so repeats
+# of one value stay visible within a capture and cannot be looked up.
+
+CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE", "")
+SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "1"))
+ENABLED = bool(CAPTURE_PATH)
+
+# Bodies larger than this are recorded by size only
+MAX_BODY = 1024 * 1024
+
+KEEP = {
+    "category_id", "test_id", "center_id", "id",
+    "price", "paid_amount", "agent_collected", "center_collected", "admin_collected",
+    "payment_status", "status", "enabled",
+    "sort", "stream", "granularity", "start_ts", "end_ts", "offset", "limit",
+    "q", "with_price",
+}
+
+# Fixed values of otherwise personal keys (booked_by, updated_by_name)
+PUBLIC_VALUES = {"Customer", "Center", "Admin"}
+
+_SALT = os.getenv("TRAFFIC_CAPTURE_SALT", "").encode() or secrets.token_bytes(16)
+
+
+def pseudonym(value):
+    return "anon:" + hashlib.blake2b(str(value).encode(), key=_SALT, digest_size=5).hexdigest()
+
+
+def anonymize(value, key=None):
+    """Same structure and types, personal values replaced."""
+    if isinstance(value, dict):
+        return {k: anonymize(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [anonymize(v, key) for v in value]
+    if value is None or isinstance(value, bool) or key in KEEP or value in PUBLIC_VALUES:
+        return value
+    if isinstance(value, str):
+        return pseudonym(value)
+    if isinstance(value, (int, float)):
+        # mobile / age / lat / lng sent as numbers
+        return pseudonym(value)
+    return type(value).__name__
+
+
+class _Writer:
+    """Appends lines to the capture file, flushed at most once a second."""
+
+    def __init__(self, path):
+        path = path.format(pid=os.getpid())
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            if time.monotonic() - self._flushed > 1:
+                self._file.flush()
+                self._flushed = time.monotonic()
+
+
+class CaptureMiddleware:
+    def __init__(self, app, path=CAPTURE_PATH, sample_rate=SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.writer = _Writer(path)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+
+        started = time.time()
+        start = time.perf_counter()
+        chunks = []
+        size = 0
+        status = 0
+        sent = 0
+        first_byte = None
+
+        async def receive_recorded():
+            nonlocal size
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= MAX_BODY:
+                    chunks.append(body)
+            return message
+
+        async def send_recorded(message):
+            nonlocal status, sent, first_byte
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                if first_byte is None:
+                    first_byte = time.perf_counter()
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_recorded, send_recorded)
+        finally:
+            end = time.perf_counter()
+            route = scope.get("route")
+            auth = (scope.get("state") or {}).get("auth") or {}
+
+            record = {
+                "ts": round(started, 4),
+                "method": scope["method"],
+                "route": getattr(route, "path", scope["path"]),
+                "params": anonymize(dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))),
+                "body": self._body(chunks, size),
+                "role": auth.get("role"),
+                "status": status,
+                "ms": round((end - start) * 1000, 3),
+                "ttfb_ms": round((first_byte - start) * 1000, 3) if first_byte else None,
+                "bytes": sent,
+            }
+            self.writer.write(record)
+
+    @staticmethod
+    def _body(chunks, size):
+        if not size:
+            return None
+        if size > MAX_BODY:
+            return {"$size": size}
+        try:
+            return anonymize(json.loads(b"".join(chunks)))
+        except ValueError:
+            return {"$size": size}
@@ -0,0 +1,333 @@
+from database_async import client, db, tests_col, centers_col, categories_col, prices_col, notices_col
+from responses import dumps
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import re
+import time
+
+log = logging.getLogger("se_booking.catalog")
+
+# ---------------- CATALOG CACHE ----------------
+# tests / centers / categories / prices / notices are small and only
+# change through the admin endpoints, so each worker keeps them in memory.
+#
+# Every collection has a version number. Admin writes call invalidate(),
+# which bumps the version; the next read reloads that collection only.
+# With a replica set, a change stream task invalidates for writes made
+# by other workers. Without one, entries expire after CATALOG_TTL seconds.
+#
+# Each loaded entry also carries a digest of its documents, used as the
+# ETag of the endpoints that serve it. It depends on the data only, so
+# every worker hands out the same ETag for the same catalog.
+
+CATALOG_TTL = int(os.getenv("CATALOG_TTL", "30"))
+
+COLLECTIONS = {
+    "tests": tests_col,
+    "centers": centers_col,
+    "categories": categories_col,
+    "prices": prices_col,
+    "notices": notices_col,
+}
+
+_lock = asyncio.Lock()
+_versions = {name: 0 for name in COLLECTIONS}
+_entries = {}  # name -> {"version", "loaded_at", "docs", ...indexes}
+_watching = False
+_watch_task = None
+_offers = {"prices": None, "centers": None, "by_test": {}, "cheapest": {}}
+
+
+def _index(name, docs):
+    entry = {"docs": docs}
+
+    if name == "tests":
+        entry["by_id"] = {}
+        entry["by_category"] = {}
+        for t in docs:
+            entry["by_id"].setdefault(t.get("id"), t)
+            entry["by_category"].setdefault(t.get("category_id"), []).append(t)
+        entry["names"] = {k: t.get("test_name", "") for k, t in entry["by_id"].items()}
+        entry["search"] = _search_index(entry["by_id"])
+
+    elif name == "centers":
+        entry["by_id"] = {}
+        for c in docs:
+            entry["by_id"].setdefault(c.get("id"), c)
+        entry["names"] = {k: c.get("center_name", "") for k, c in entry["by_id"].items()}
+
+    elif name == "notices":
+        entry["by_id"] = {n.get("id"): n for n in docs}
+
+    elif name == "prices":
+        entry["by_center"] = {}
+        for p in docs:
+            entry["by_center"].setdefault(p.get("center_id"), []).append(p)
+
+    return entry
+
+
+def _expired(entry):
+    return not _watching and CATALOG_TTL > 0 and time.time() - entry["loaded_at"] > CATALOG_TTL
+
+
+async def _get(name):
+    entry = _entries.get(name)
+    if entry and entry["version"] == _versions[name] and not _expired(entry):
+        return entry
+
+    async with _lock:
+        entry = _entries.get(name)
+        if entry and entry["version"] == _versions[name] and not _expired(entry):
+            return entry
+
+        version = _versions[name]
+        docs = await COLLECTIONS[name].find({}, {"_id": 0}).to_list(None)
+        entry = _index(name, docs)
+        entry["digest"] = hashlib.blake2b(dumps(docs), digest_size=8).hexdigest()
+        entry["version"] = version
+        entry["loaded_at"] = time.time()
+        _entries[name] = entry
+        return entry
+
+
+def invalidate(*names):
+    """Drop the cached copy of these collections (call after admin writes)."""
+    for name in names:
+        _versions[name] += 1
+
+
+async def etag(*names):
+    """Weak ETag over the current contents of these collections."""
+    entries = [await _get(name) for name in names]
+    return 'W/"{}"'.format("-".join(e["digest"] for e in entries))
+
+
+async def load_all():
+    await asyncio.gather(*(_get(name) for name in COLLECTIONS))
+
+
+# ---------------- READ HELPERS ----------------
+# Returned docs are shared between requests; do not mutate them.
+
+async def tests():
+    return (await _get("tests"))["docs"]
+
+
+async def test_names():
+    return (await _get("tests"))["names"]
+
+
+async def tests_by_category(category_id):
+    return (await _get("tests"))["by_category"].get(category_id, [])
+
+
+async def centers():
+    return (await _get("centers"))["docs"]
+
+
+async def center(center_id):
+    return (await _get("centers"))["by_id"].get(center_id)
+
+
+async def center_names():
+    return (await _get("centers"))["names"]
+
+
+async def categories():
+    return (await _get("categories"))["docs"]
+
+
+async def notice(notice_id):
+    return (await _get("notices"))["by_id"].get(notice_id)
+
+
+async def prices_for_center(center_id):
+    return (await _get("prices"))["by_center"].get(center_id, [])
+
+
+# ---------------- CENTERS PER TEST ----------------
+# get_centers view: enabled prices joined to enabled centers, projected
+# to the fields the app renders, plus the cheapest of them per test.
+# Rebuilt when prices or centers reload.
+
+def _build_offers(prices, centers):
+    by_test = {}
+    for p in prices["docs"]:
+        if p.get("enabled") is not True:
+            continue
+
+        center = centers["by_id"].get(p.get("center_id"))
+        if not center or center.get("enabled") is not True:
+            continue
+
+        by_test.setdefault(p.get("test_id"), []).append({
+            "center_id": center["id"],
+            "center_name": center.get("center_name", ""),
+            "address": center.get("address", ""),
+            "lat": center.get("lat"),
+            "lng": center.get("lng"),
+            "timings": center.get("timings", []),
+            "price": p.get("price"),
+            "enabled": True
+        })
+    return by_test
+
+
+async def _current_offers():
+    prices, centers = await asyncio.gather(_get("prices"), _get("centers"))
+    if _offers["prices"] is not prices or _offers["centers"] is not centers:
+        by_test = _build_offers(prices, centers)
+        cheapest = {}
+        for test_id, offers in by_test.items():
+            amounts = [o["price"] for o in offers if isinstance(o["price"], (int, float))]
+            if amounts:
+                cheapest[test_id] = min(amounts)
+        _offers["by_test"] = by_test
+        _offers["cheapest"] = cheapest
+        _offers["prices"] = prices
+        _offers["centers"] = centers
+    return _offers
+
+
+async def centers_for_test(test_id):
+    return (await _current_offers())["by_test"].get(test_id, [])
+
+
+async def cheapest_prices():
+    """test_id -> lowest price among the offers centers_for_test returns."""
+    return (await _current_offers())["cheapest"]
+
+
+# ---------------- TEST SEARCH ----------------
+# /search_tests typeahead over test_name, indexed with the tests entry so
+# add_test / update_test (via invalidate) rebuild it:
+#
+#   words   word prefix -> ids of tests with a word starting with it
+#   grams   trigram of the whole name -> ids, for typos and infixes
+#
+# Every query word has to prefix some word of the name. Those hits rank
+# exact name, then name prefix, then names starting with the first query
+# word, then the rest, shorter names first within each. When
+# they do not fill the limit, names sharing half the query's trigrams
+# follow, most shared first.
+
+MAX_PREFIX = 20
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9]+", str(text or "").lower())
+
+
+def _trigrams(text):
+    text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _search_index(by_id):
+    names, words, grams = {}, {}, {}
+    for test_id, t in by_id.items():
+        name = " ".join(_words(t.get("test_name")))
+        if not name:
+            continue
+        names[test_id] = name
+        for word in set(name.split()):
+            for n in range(1, min(len(word), MAX_PREFIX) + 1):
+                words.setdefault(word[:n], set()).add(test_id)
+        for gram in _trigrams(name):
+            grams.setdefault(gram, set()).add(test_id)
+    return {"names": names, "words": words, "grams": grams}
+
+
+async def search_tests(q, limit=20):
+    entry = await _get("tests")
+    index = entry["search"]
+    names = index["names"]
+
+    words = _words(q)
+    if not words or limit <= 0:
+        return []
+    query = " ".join(words)
+
+    hits = set.intersection(*(index["words"].get(w[:MAX_PREFIX], set()) for w in words))
+
+    def rank(test_id):
+        name = names[test_id]
+        if name == query:
+            tier = 0
+        elif name.startswith(query):
+            tier = 1
+        else:
+            tier = 2 if name.startswith(words[0]) else 3
+        return (tier, len(name), name)
+
+    found = heapq.nsmallest(limit, hits, key=rank)
+
+    if len(found) < limit and len(query) >= 3:
+        grams = _trigrams(query)
+        shared = {}
+        for gram in grams:
+            for test_id in index["grams"].get(gram, ()):
+                shared[test_id] = shared.get(test_id, 0) + 1
+        similar = [
+            test_id for test_id, n in shared.items()
+            if test_id not in hits and 2 * n >= len(grams)
+        ]
+        found += heapq.nsmallest(
+            limit - len(found), similar, key=lambda test_id: (-shared[test_id], len(names[test_id]), names[test_id])
+        )
+
+    return [entry["by_id"][test_id] for test_id in found]
+
+
+# ---------------- CHANGE STREAM ----------------
+
+async def _watch():
+    global _watching
+    pipeline = [{"$match": {"ns.coll": {"$in": list(COLLECTIONS)}}}]
+
+    while True:
+        try:
+            async with await db.watch(pipeline) as stream:
+                # Anything written before the stream opened may be missed
+                invalidate(*COLLECTIONS)
+                _watching = True
+                async for change in stream:
+                    invalidate(change["ns"]["coll"])
+        except asyncio.CancelledError:
+            _watching = False
+            raise
+        except Exception as e:
+            log.warning("catalog change stream stopped: %s", e)
+        _watching = False
+        await asyncio.sleep(5)
+
+
+async def start_watcher():
+    """Follow a change stream when Mongo is a replica set; else rely on TTL."""
+    global _watch_task
+    if _watch_task:
+        return True
+    try:
+        hello = await client.admin.command("hello")
+    except Exception as e:
+        log.warning("catalog: cannot check replica set status: %s", e)
+        return False
+
+    # Change streams need a replica set (or mongos)
+    if not (hello.get("setName") or hello.get("msg") == "isdbgrid"):
+        return False
+
+    _watch_task = asyncio.create_task(_watch())
+    return True
+
+
+async def stop_watcher():
+    global _watch_task
+    if _watch_task:
+        _watch_task.cancel()
+        _watch_task = None
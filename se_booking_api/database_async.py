@@ -0,0 +1,56 @@
+from pymongo import AsyncMongoClient
+from mongo_options import Lazy, mongo_url
+import metrics
+import mongo_options
+import os
+import querylog
+
+# Mongo handles for the FastAPI handlers and the scripts next to them
+# (indexes.py, rollups.py).
+#
+# Nothing connects at import: the client is built on first use (see
+# mongo_options.Lazy) and warmup.py opens its pool at startup.
+
+# Benchmarks and tests point this at a throwaway database
+MONGO_DB = os.getenv("MONGO_DB", "se_booking")
+
+
+# Pool size, compression and timeouts from the environment (see
+# mongo_options.py); serve.py sets MONGO_MAX_POOL_SIZE per worker
+def _client():
+    return AsyncMongoClient(
+        mongo_url(),
+        event_listeners=metrics.MONGO_LISTENERS + querylog.MONGO_LISTENERS,
+        **mongo_options.client_options()
+    )
+
+
+def _collection(database, name):
+    return Lazy(lambda: database[name])
+
+
+client = Lazy(_client)
+db = Lazy(lambda: client.get_database(MONGO_DB))
+
+# Same client, report reads go to a secondary when there is one
+reports_db = Lazy(lambda: client.get_database(MONGO_DB, read_preference=mongo_options.reports_read_preference()))
+
+# USER SIDE
+tests_col = _collection(db, "tests")
+centers_col = _collection(db, "centers")
+prices_col = _collection(db, "prices")
+bookings_col = _collection(db, "bookings")
+
+# ADMIN
+admins_col = _collection(db, "admins")
+center_users_col = _collection(db, "center_users")
+categories_col = _collection(db, "categories")
+notices_col = _collection(db, "notices")
+agents_col = _collection(db, "agents")
+
+# REPORTS
+center_daily_col = _collection(db, "center_daily_stats")
+rollup_state_col = _collection(db, "rollup_state")
+rollup_failures_col = _collection(db, "rollup_failures")
+reports_bookings_col = _collection(reports_db, "bookings")
+reports_center_daily_col = _collection(reports_db, "center_daily_stats")
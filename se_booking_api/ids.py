@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+
+# ---------------- ID GENERATOR ----------------
+# Snowflake-style ids, unique without a DB round trip:
+#
+#   41 bits  milliseconds since EPOCH_MS
+#    5 bits  worker id (WORKER_ID env, else pid)
+#    7 bits  sequence within the millisecond
+#
+# 53 bits in total, so ids stay exact as Dart/JS numbers on Flutter web.
+# When a worker uses up the sequence in one millisecond, it moves on to
+# the next millisecond instead of sleeping. The unique indexes on
+# booking_id / tests.id / categories.id catch workers that share an id,
+# and the insert is retried with a fresh one (main.py).
+#
+# Every process writing to one database needs its own worker id:
+#   - serve.py gives its workers WORKER_ID, WORKER_ID + 1, ... (2 x workers
+#     slots, see serve.py); containers sharing a database need disjoint
+#     ranges, e.g. WORKER_ID=0 and 16 for two containers of 8 workers
+#   - serve.py without gunicorn runs one process, with WORKER_ID
+#   - plain uvicorn (--workers) falls back to pid & 31, which can clash
+
+EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+
+WORKER_BITS = 5
+SEQUENCE_BITS = 7
+
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+WORKER_ID = int(os.getenv("WORKER_ID", os.getpid())) & MAX_WORKER
+
+_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+
+
+def next_id():
+    """Return a new unique, increasing integer id."""
+    global _last_ms, _sequence
+
+    with _lock:
+        now = int(time.time() * 1000) - EPOCH_MS
+
+        # Clock went back or same millisecond: stay on _last_ms
+        if now <= _last_ms:
+            _sequence = (_sequence + 1) & MAX_SEQUENCE
+            if _sequence == 0:
+                _last_ms += 1
+        else:
+            _last_ms = now
+            _sequence = 0
+
+        return (_last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (WORKER_ID << SEQUENCE_BITS) | _sequence
+
+
+def new_booking_id():
+    return f"BKG{next_id()}"
@@ -0,0 +1,178 @@
+from database_async import db
+from pymongo.errors import OperationFailure
+
+import asyncio
+import logging
+import sys
+
+log = logging.getLogger("se_booking.indexes")
+
+# ---------------- INDEX REGISTRY ----------------
+# (collection, keys, options). Applied at startup by ensure_indexes();
+# create_index is a no-op when the index already exists.
+
+INDEXES = [
+    # mark_done / update_payment_details / update_payment
+    ("bookings", [("booking_id", 1)], {"unique": True}),
+    # bookings_by_mobile
+    ("bookings", [("mobile", 1)], {}),
+    # center_bookings (sorted by created_at DESC)
+    ("bookings", [("center_id", 1), ("created_at", -1)], {}),
+    # agent_bookings (sorted by created_at DESC)
+    ("bookings", [("booked_by", 1), ("created_at", -1)], {}),
+    # admin_all_bookings / center_stats date range
+    ("bookings", [("created_at", -1)], {}),
+    # admin_all_bookings filters (each sorted by created_at DESC); other
+    # filters given with these are applied to the few documents they match
+    ("bookings", [("center_id", 1), ("status", 1), ("created_at", -1)], {}),
+    ("bookings", [("status", 1), ("created_at", -1)], {}),
+    ("bookings", [("payment_status", 1), ("created_at", -1)], {}),
+    ("bookings", [("test_id", 1), ("created_at", -1)], {}),
+
+    # center_stats rollups
+    ("center_daily_stats", [("center_id", 1), ("day", 1)], {"unique": True}),
+    ("center_daily_stats", [("day", 1)], {}),
+
+    # get_centers
+    ("prices", [("test_id", 1), ("enabled", 1)], {}),
+    # set_price upsert / admin_pricing
+    ("prices", [("center_id", 1), ("test_id", 1)], {}),
+
+    ("tests", [("id", 1)], {"unique": True}),
+    ("tests", [("category_id", 1)], {}),
+    ("tests", [("test_name", 1)], {}),
+    ("centers", [("id", 1)], {}),
+    ("categories", [("id", 1)], {"unique": True}),
+    ("categories", [("name", 1)], {}),
+    ("notices", [("id", 1)], {}),
+
+    # logins
+    ("admins", [("username", 1)], {}),
+    ("center_users", [("username", 1)], {}),
+    ("center_users", [("center_id", 1)], {}),
+    ("agents", [("username", 1)], {}),
+]
+
+
+class MissingIndexError(Exception):
+    """A unique index could not be built, e.g. duplicate ids in old data.
+
+    The id clash retries (add_bookings, add_test, add_category) and the
+    indexed lookups rely on these, so warmup keeps the worker unready
+    instead of serving without them.
+    """
+
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__("unique indexes missing: " + ", ".join(
+            f"{coll} {keys}" for coll, keys in missing))
+
+
+async def ensure_indexes():
+    """Create every index in INDEXES.
+
+    A failed plain index is logged. A failed unique index raises
+    MissingIndexError once every other index has been tried.
+    """
+    missing = []
+    for coll, keys, options in INDEXES:
+        try:
+            await db[coll].create_index(keys, **options)
+        except OperationFailure as e:
+            log.error("index %s %s not created: %s", coll, keys, e)
+            if options.get("unique"):
+                missing.append((coll, keys))
+    if missing:
+        raise MissingIndexError(missing)
+
+
+async def duplicates(coll, keys, limit=10):
+    """Key values held by more than one document, most repeated first."""
+    group = {name: f"${name}" for name, _ in keys}
+    pipeline = [
+        {"$group": {"_id": group, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+    cursor = await db[coll].aggregate(pipeline)
+    return [(d["_id"], d["count"]) async for d in cursor]
+
+
+# ---------------- QUERY PLAN CHECK ----------------
+# The queries the endpoints run, with sample values. None of them may
+# fall back to a collection scan.
+
+PLAN_CHECKS = [
+    ("mark_done", "bookings", {"booking_id": "BKG0"}, None),
+    ("update_payment_details", "bookings", {"booking_id": "BKG0"}, None),
+    ("bookings_by_mobile", "bookings",
+     {"$or": [{"mobile": "9999999999"}, {"mobile": 9999999999}]}, None),
+    ("center_bookings", "bookings",
+     {"$or": [{"center_id": 1}, {"center_id": "1"}]}, [("created_at", -1)]),
+    ("agent_bookings", "bookings", {"booked_by": "agent"}, [("created_at", -1)]),
+    ("admin_all_bookings", "bookings", {}, [("created_at", -1)]),
+    ("admin_bookings_center_status", "bookings",
+     {"center_id": {"$in": [1, "1"]}, "status": "Pending", "created_at": {"$gte": 0, "$lte": 1}},
+     [("created_at", -1)]),
+    ("admin_bookings_status", "bookings",
+     {"status": "Pending", "created_at": {"$gte": 0, "$lte": 1}}, [("created_at", -1)]),
+    ("admin_bookings_payment_status", "bookings",
+     {"payment_status": {"$in": ["Unpaid", None]}}, [("created_at", -1)]),
+    ("admin_bookings_test", "bookings", {"test_id": {"$in": [1, "1"]}}, [("created_at", -1)]),
+    ("center_stats", "center_daily_stats", {"day": {"$gte": 0, "$lte": 1}}, None),
+    ("get_centers", "prices", {"test_id": 1, "enabled": True}, None),
+    ("set_price", "prices", {"center_id": 1, "test_id": 1}, None),
+    ("admin_login", "admins", {"username": "admin"}, None),
+    ("center_login", "center_users", {"username": "center"}, None),
+    ("agent_login", "agents", {"username": "agent"}, None),
+]
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+async def verify_query_plans():
+    """Return the names of the PLAN_CHECKS whose winning plan is a COLLSCAN."""
+    failures = []
+    for name, coll, query, sort in PLAN_CHECKS:
+        cursor = db[coll].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _stages(plan):
+            failures.append(name)
+    return failures
+
+
+async def _main():
+    try:
+        await ensure_indexes()
+    except MissingIndexError as e:
+        for coll, keys in e.missing:
+            print(f"MISSING: unique index {coll} {keys}")
+            for value, count in await duplicates(coll, keys):
+                print(f"  {value} x{count}")
+        sys.exit(1)
+    if "--verify" in sys.argv:
+        failures = await verify_query_plans()
+        for name in failures:
+            print(f"COLLSCAN: {name}")
+        if failures:
+            sys.exit(1)
+        print("all queries use an index")
+
+
+if __name__ == "__main__":
+    # python indexes.py            -> create indexes, fail (and list the
+    #                                 duplicates) if a unique one can't be built
+    # python indexes.py --verify   -> create indexes, fail on any COLLSCAN
+    asyncio.run(_main())
@@ -0,0 +1,19 @@
+import asyncio
+import catalog
+
+
+# ---------------- NAME JOINS ----------------
+# Booking lists only need test_name / center_name. Both come from the
+# in-memory catalog, so enrichment is a dict lookup per row instead of
+# one find_one per booking.
+
+async def _empty():
+    return {}
+
+
+async def resolve_names(tests=True, centers=True):
+    """Return the catalog's (test_names, center_names) dicts, keyed by id."""
+    return await asyncio.gather(
+        catalog.test_names() if tests else _empty(),
+        catalog.center_names() if centers else _empty(),
+    )
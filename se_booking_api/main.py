@@ -1,714 +1,1004 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from database import (
-    tests_col,
-    centers_col,
-    prices_col,
-    bookings_col,
-    admins_col,
-    center_users_col,
-    admins_col,
-    center_users_col,
-    categories_col,
-    notices_col,
-    agents_col
-)
-
-import time
-
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# ---------------- HOME ----------------
-@app.get("/")
-def home():
-    return {"status": "SE Booking API running"}
-
-# ---------------- GET NOTICE ----------------
-@app.get("/get_notice")
-def get_notice():
-    notice = notices_col.find_one({"id": "home_notice"}, {"_id": 0})
-    if not notice:
-        return {"text": "", "enabled": False}
-    return notice
-
-# ---------------- UPDATE NOTICE ----------------
-@app.post("/admin/update_notice")
-def update_notice(data: dict):
-    notices_col.update_one(
-        {"id": "home_notice"},
-        {
-            "$set": {
-                "text": data.get("text", ""),
-                "enabled": bool(data.get("enabled", False))
-            }
-        },
-        upsert=True
-    )
-    return {"status": "updated"}
-
-# ---------------- GET TESTS ----------------
-@app.get("/get_tests")
-def get_tests(category_id: int):
-    return list(
-        tests_col.find(
-            {"category_id": category_id},
-            {"_id": 0}
-        )
-    )
-
-
-# ---------------- GET CENTERS ----------------
-@app.get("/get_centers")
-def get_centers(test_id: int):
-    prices = list(
-        prices_col.find(
-            {"test_id": test_id, "enabled": True},
-            {"_id": 0}
-        )
-    )
-
-    result = []
-
-    for p in prices:
-        center = centers_col.find_one(
-            {"id": p["center_id"], "enabled": True},
-            {"_id": 0}
-        )
-
-        if center:
-            result.append({
-                "center_id": center["id"],
-                "center_name": center["center_name"],
-                "address": center["address"],
-                "lat": center.get("lat"),
-                "lng": center.get("lng"),
-                "timings": center.get("timings", []),
-                "price": p["price"],
-                "enabled": True  # ✅ SEND THIS
-            })
-
-    return result
-
-
-
-# ---------------- ADD BOOKING ----------------
-@app.post("/add_booking")
-def add_booking(data: dict):
-    booking_id = f"BKG{int(time.time())}"
-    current_time = int(time.time())
-    
-    booked_by = data.get("booked_by", "Customer")
-    price = float(data["price"])
-    
-    # Amount paid at booking time
-    paid_amount = float(data.get("paid_amount", 0))
-    
-    # Validation: If legacy 'payment_status'='Paid', assume full price
-    if data.get("payment_status") == "Paid" and paid_amount == 0:
-        paid_amount = price
-
-    agent_collected = 0.0
-    center_collected = 0.0
-
-    # Attribution
-    if booked_by not in ["Customer", "Center"]: 
-        agent_collected = paid_amount
-    elif booked_by == "Center":
-        center_collected = paid_amount
-    
-    # Calculate Status
-    total_paid = agent_collected + center_collected
-    balance_due = price - total_paid
-    
-    input_status = data.get("payment_status", "Unpaid")
-    
-    if "Pending" in input_status:
-        payment_status = input_status
-    elif balance_due <= 0:
-        payment_status = "Paid"
-    elif total_paid > 0:
-        payment_status = "Partial"
-    else:
-        payment_status = "Unpaid"
-
-    booking = {
-        "booking_id": booking_id,
-        "patient_name": data["name"],
-        "mobile": data["mobile"],
-        "age": data.get("age"),
-        "gender": data.get("gender"),
-        "address": data.get("address"),
-        "center_id": data["center_id"],
-        "test_id": data["test_id"],
-        "price": price,
-        "status": "Pending",
-        "created_at": current_time,
-        "booked_by": booked_by,
-        
-        # Payment Breakdown
-        "agent_collected": agent_collected,
-        "center_collected": center_collected,
-        "payment_status": payment_status,
-        "payment_updated_by": booked_by if total_paid > 0 else None,
-        "payment_updated_at": current_time if total_paid > 0 else None
-    }
-
-    bookings_col.insert_one(booking)
-    return {"booking_id": booking_id}
-
-
-# ---------------- UPDATE PAYMENT DETAILS (New Generic) ----------------
-# ---------------- UPDATE PAYMENT DETAILS (New Generic) ----------------
-@app.post("/update_payment_details")
-def update_payment_details(data: dict):
-    booking_id = data.get("booking_id")
-    booking = bookings_col.find_one({"booking_id": booking_id})
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    price = float(booking.get("price", 0))
-    
-    # Update provided fields only
-    agent_collected = float(data.get("agent_collected", booking.get("agent_collected", 0)))
-    center_collected = float(data.get("center_collected", booking.get("center_collected", 0)))
-    admin_collected = float(data.get("admin_collected", booking.get("admin_collected", 0)))
-
-    total_paid = agent_collected + center_collected + admin_collected
-    balance_due = price - total_paid
-    
-    if balance_due <= 0:
-        new_status = "Paid"
-    elif total_paid > 0:
-        new_status = "Partial"
-    else:
-        new_status = "Unpaid"
-
-    updated_by = data.get("updated_by_name", "Admin")
-
-    bookings_col.update_one(
-        {"booking_id": booking_id},
-        {"$set": {
-            "agent_collected": agent_collected,
-            "center_collected": center_collected,
-            "admin_collected": admin_collected,
-            "payment_status": new_status,
-            "payment_updated_by": updated_by,
-            "payment_updated_at": int(time.time())
-        }}
-    )
-    return {"status": "updated", "payment_status": new_status}
-
-
-# ---------------- ADMIN STATS (CENTER WISE) ----------------
-@app.get("/admin/center_stats")
-def get_center_stats(start_ts: int = None, end_ts: int = None):
-    pipeline = []
-    
-    # 1. Match Stage (Filter by Date if provided)
-    if start_ts is not None and end_ts is not None:
-        pipeline.append({
-            "$match": {
-                "created_at": {"$gte": start_ts, "$lte": end_ts}
-            }
-        })
-
-    # 2. Group Stage
-    pipeline.append({
-            "$group": {
-                "_id": "$center_id",
-                "total_bookings": {"$sum": 1},
-                "total_revenue": {"$sum": "$price"},
-                "paid_count": {
-                    "$sum": { "$cond": [ {"$eq": ["$payment_status", "Paid"]}, 1, 0 ] }
-                },
-                "unpaid_count": {
-                    "$sum": { "$cond": [ {"$eq": ["$payment_status", "Unpaid"]}, 1, 0 ] }
-                },
-                "partial_count": {
-                    "$sum": { "$cond": [ {"$eq": ["$payment_status", "Partial"]}, 1, 0 ] }
-                },
-                # Use $ifNull to handle old documents without these fields
-                "total_agent_collected": {"$sum": { "$ifNull": ["$agent_collected", 0] }},
-                "total_center_collected": {"$sum": { "$ifNull": ["$center_collected", 0] }},
-                "total_admin_collected": {"$sum": { "$ifNull": ["$admin_collected", 0] }}
-            }
-    })
-    
-    stats = list(bookings_col.aggregate(pipeline))
-    result = []
-    
-    for s in stats:
-        # Resolve Center Name
-        c_id = s["_id"]
-        center = None
-        if isinstance(c_id, int) or (isinstance(c_id, str) and c_id.isdigit()):
-            center = centers_col.find_one({"id": int(c_id)})
-        
-        c_name = center["center_name"] if center else f"ID: {c_id}"
-        
-        total_collected = (s.get("total_agent_collected", 0) + 
-                           s.get("total_center_collected", 0) + 
-                           s.get("total_admin_collected", 0))
-
-        result.append({
-            "center_name": c_name,
-            "total_bookings": s["total_bookings"],
-            "total_revenue": s["total_revenue"],
-            "paid_count": s["paid_count"],
-            "unpaid_count": s["unpaid_count"] + s["partial_count"], 
-            "agent_collected": s.get("total_agent_collected", 0),
-            "center_collected": s.get("total_center_collected", 0),
-            "admin_collected": s.get("total_admin_collected", 0),
-            "total_due": s["total_revenue"] - total_collected
-        })
-    
-    return result
-
-# ---------------- BOOKING HISTORY (NEW) ----------------
-@app.get("/bookings_by_mobile")
-def bookings_by_mobile(mobile: str):
-    mobile = mobile.strip()
-
-    # Search both string and number (handles old + new data)
-    query = {
-        "$or": [
-            {"mobile": mobile},
-            {"mobile": int(mobile)} if mobile.isdigit() else {}
-        ]
-    }
-
-    bookings = list(bookings_col.find(
-        query,
-        {"_id": 0, "mobile": 0}
-    ))
-
-    result = []
-    for b in bookings:
-        test = tests_col.find_one({"id": b["test_id"]}, {"_id": 0})
-        center = centers_col.find_one({"id": b["center_id"]}, {"_id": 0})
-
-        result.append({
-            "booking_id": b["booking_id"],
-            "patient_name": b["patient_name"],
-            "test_name": test["test_name"] if test else "",
-            "center_name": center["center_name"] if center else "",
-            "price": b["price"],
-            "status": b["status"],
-            "date": b["created_at"],
-            "payment_status": b.get("payment_status", "Unpaid"),
-            "agent_collected": b.get("agent_collected", 0),
-            "center_collected": b.get("center_collected", 0)
-        })
-
-    return result
-# ================= ADMIN LOGIN =================
-@app.post("/admin/login")
-def admin_login(data: dict):
-    admin = admins_col.find_one({
-        "username": data.get("username"),
-        "password": data.get("password")
-    })
-
-    if not admin:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-
-    return {"status": "success"}
-# ================= ADD TEST =================
-@app.post("/admin/add_test")
-def add_test(data: dict):
-    if tests_col.find_one({"test_name": data["test_name"]}):
-        raise HTTPException(status_code=400, detail="Test already exists")
-
-    tests_col.insert_one({
-        "id": int(time.time()),
-        "category_id": data["category_id"],
-        "test_name": data["test_name"]
-    })
-    return {"status": "test added"}
-
-# ================= ADD CENTER =================
-@app.post("/admin/add_center")
-def add_center(data: dict):
-    if centers_col.find_one({"id": data["id"]}):
-        raise HTTPException(status_code=400, detail="Center exists")
-
-    centers_col.insert_one({
-        "id": data["id"],
-        "center_name": data["center_name"],
-        "address": data["address"],
-        "lat": data.get("lat"),
-        "lng": data.get("lng"),
-        "timings": data.get("timings", []),
-        "enabled": True
-    })
-
-    return {"status": "center added"}
-
-# ================= SET PRICE (ASSIGN TEST TO CENTER) =================
-@app.post("/admin/set_price")
-def set_price(data: dict):
-    prices_col.update_one(
-        {
-            "center_id": int(data["center_id"]),
-            "test_id": int(data["test_id"])
-        },
-        {
-            "$set": {
-                "price": float(data["price"]),
-                "enabled": bool(data.get("enabled", True))
-            }
-        },
-        upsert=True
-    )
-    return {"status": "price updated"}
-
-# ================= CENTER LOGIN =================
-@app.post("/center/login")
-def center_login(data: dict):
-    user = center_users_col.find_one({
-        "username": data.get("username"),
-        "password": data.get("password")
-    })
-
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-
-    center = centers_col.find_one({"id": user["center_id"]}, {"_id": 0})
-
-    return {
-        "center_id": user["center_id"],
-        "center_name": center["center_name"] if center else ""
-    }
-
-@app.get("/center/bookings")
-def center_bookings(center_id: int):
-    query = {
-        "$or": [
-            {"center_id": center_id},
-            {"center_id": str(center_id)}
-        ]
-    }
-
-    # Sort DESC
-    bookings = list(bookings_col.find(
-        query,
-        {"_id": 0, "mobile": 0}
-    ).sort("created_at", -1))
-
-    result = []
-    for b in bookings:
-        test = tests_col.find_one({"id": b.get("test_id")}, {"_id": 0})
-
-        result.append({
-            "booking_id": b.get("booking_id"),
-            "patient_name": b.get("patient_name"),
-            "test_name": test["test_name"] if test else "",
-            "price": b.get("price"),
-            "status": b.get("status"),
-            "created_at": b.get("created_at"),
-            "booked_by": b.get("booked_by", "Customer"),
-            "payment_status": b.get("payment_status", "Unpaid"),
-            "payment_updated_by": b.get("payment_updated_by"),
-            "agent_collected": b.get("agent_collected", 0),
-            "center_collected": b.get("center_collected", 0)
-        })
-
-    return result
-
-@app.get("/agent/bookings")
-def agent_bookings(agent_name: str):
-    # Sort DESC
-    bookings = list(bookings_col.find(
-        {"booked_by": agent_name},
-        {"_id": 0}
-    ).sort("created_at", -1))
-
-    result = []
-    for b in bookings:
-        test = tests_col.find_one({"id": b.get("test_id")}, {"_id": 0})
-        center = centers_col.find_one({"id": b.get("center_id")}, {"_id": 0})
-
-        result.append({
-            "booking_id": b.get("booking_id"),
-            "patient_name": b.get("patient_name"),
-            "mobile": b.get("mobile"),
-            "test_name": test["test_name"] if test else "",
-            "center_name": center["center_name"] if center else "",
-            "price": b.get("price"),
-            "status": b.get("status"),
-            "created_at": b.get("created_at"),
-            "payment_status": b.get("payment_status", "Unpaid"),
-            "payment_updated_by": b.get("payment_updated_by"),
-            "agent_collected": b.get("agent_collected", 0),
-            "center_collected": b.get("center_collected", 0)
-        })
-
-    return result
-
-# ================= MARK BOOKING DONE =================
-@app.post("/center/mark_done")
-def mark_done(data: dict):
-    result = bookings_col.update_one(
-        {"booking_id": data.get("booking_id")},
-        {"$set": {"status": "Done"}}
-    )
-
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
-    return {"status": "updated"}
-@app.get("/admin/centers")
-def admin_get_centers():
-    return list(centers_col.find({}, {"_id": 0}))
-
-@app.get("/admin/tests")
-def admin_get_tests():
-    return list(tests_col.find({}, {"_id": 0}))
-
-@app.get("/admin/pricing")
-def admin_pricing(center_id: int):
-    result = []
-
-    tests = list(tests_col.find({}, {"_id": 0}))
-
-    for t in tests:
-        price_row = prices_col.find_one(
-            {
-                "$or": [
-                    {"center_id": center_id, "test_id": t.get("id")},
-                    {"center_id": str(center_id), "test_id": t.get("id")}
-                ]
-            },
-            {"_id": 0}
-        )
-
-        result.append({
-            "test_id": t.get("id"),
-            "test_name": t.get("test_name", ""),
-            "category_id": t.get("category_id"),
-            "price": price_row.get("price") if price_row else "",
-            "enabled": price_row.get("enabled", False) if price_row else False
-        })
-
-    return result
-
-
-
-@app.get("/admin/center_users")
-def get_center_users():
-    return list(center_users_col.find({}, {"_id": 0}))
-@app.post("/admin/create_center_user")
-def create_center_user(data: dict):
-    if center_users_col.find_one({"username": data["username"]}):
-        raise HTTPException(status_code=400, detail="Username already exists")
-
-    center_users_col.insert_one({
-        "center_id": int(data["center_id"]),
-        "username": data["username"],
-        "password": data["password"]
-    })
-
-    return {"status": "center user created"}
-
-# ================= ADD CATEGORY =================
-@app.post("/admin/add_category")
-def add_category(data: dict):
-    if categories_col.find_one({"name": data["name"]}):
-        raise HTTPException(status_code=400, detail="Category exists")
-
-    categories_col.insert_one({
-        "id": int(time.time()),
-        "name": data["name"]
-    })
-    return {"status": "category added"}
-
-
-# ================= GET CATEGORIES =================
-@app.get("/admin/categories")
-def get_categories():
-    return list(categories_col.find({}, {"_id": 0}))
-
-# UPDATE CENTER DETAILS
-@app.post("/admin/update_center")
-def update_center(data: dict):
-    update_data = {
-        "center_name": data["center_name"],
-        "address": data["address"],
-    }
-
-    if "lat" in data and data["lat"] is not None:
-        update_data["lat"] = float(data["lat"])
-
-    if "lng" in data and data["lng"] is not None:
-        update_data["lng"] = float(data["lng"])
-
-    if "timings" in data:
-        update_data["timings"] = data["timings"]
-
-    result = centers_col.update_one(
-        {"id": int(data["id"])},
-        {"$set": update_data}
-    )
-
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Center not found")
-
-    return {"status": "center updated"}
-
-
-@app.post("/admin/update_center_user")
-def update_center_user(data: dict):
-    result = center_users_col.update_one(
-        {"center_id": int(data["center_id"])},
-        {"$set": {
-            "username": data["username"],
-            "password": data["password"]
-        }}
-    )
-
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Center user not found")
-
-    return {"status": "center user updated"}
-
-@app.post("/admin/update_test")
-def update_test(data: dict):
-    result = tests_col.update_one(
-        {"id": int(data["test_id"])},
-        {"$set": {"test_name": data["test_name"]}}
-    )
-    return {"status": "updated"}
-
-@app.post("/admin/toggle_center")
-def toggle_center(data: dict):
-    result = centers_col.update_one(
-        {"id": int(data["center_id"])},
-        {"$set": {"enabled": bool(data["enabled"])}}
-    )
-
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Center not found")
-
-    return {"status": "updated"}
-
-
-@app.get("/admin/bookings")
-def admin_all_bookings():
-    # Sort by created_at descending (-1)
-    bookings = list(bookings_col.find({}, {"_id": 0}).sort("created_at", -1))
-
-    result = []
-    for b in bookings:
-        test = tests_col.find_one({"id": b["test_id"]}, {"_id": 0})
-        center = centers_col.find_one({"id": b["center_id"]}, {"_id": 0})
-
-        result.append({
-            "booking_id": b["booking_id"],
-            "patient_name": b["patient_name"],
-            "mobile": b["mobile"],
-            "age": b.get("age"),
-            "gender": b.get("gender"),
-            "address": b.get("address"),
-            "test_name": test["test_name"] if test else "",
-            "center_name": center["center_name"] if center else "",
-            "status": b["status"],
-            "created_at": b["created_at"],
-            "booked_by": b.get("booked_by", "Customer"),
-            "payment_status": b.get("payment_status", "Unpaid"),
-            "payment_updated_by": b.get("payment_updated_by"),
-            "payment_updated_at": b.get("payment_updated_at"),
-            "agent_collected": b.get("agent_collected", 0),
-            "center_collected": b.get("center_collected", 0),
-            "admin_collected": b.get("admin_collected", 0),
-            "price": b.get("price", 0)
-        })
-
-    return result
-
-
-# ================= AGENT SECTION =================
-
-@app.post("/agent/login")
-def agent_login(data: dict):
-    agent = agents_col.find_one({
-        "username": data.get("username"),
-        "password": data.get("password")
-    })
-
-    if not agent:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-
-    return {
-        "agent_id": str(agent["_id"]),
-        "agent_name": agent["name"]
-    }
-
-@app.post("/center/update_payment_status")
-def update_payment(data: dict):
-    # This endpoint is used by Center AND Admin
-    # Admin or Center can pass "updated_by_name"
-    updater_name = data.get("updated_by_name", "Center")
-    
-    result = bookings_col.update_one(
-        {"booking_id": data.get("booking_id")},
-        {"$set": {
-            "payment_status": data.get("payment_status"),
-            "payment_updated_by": updater_name,
-            "payment_updated_at": int(time.time())
-        }}
-    )
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    return {"status": "updated"}
-
-@app.post("/admin/update_agent")
-def update_agent(data: dict):
-    # Use username as key for now or pass _id if available
-    # Assuming user sends old_username to find and update
-    query = {}
-    if "id" in data:
-        from bson.objectid import ObjectId
-        query = {"_id": ObjectId(data["id"])}
-    else:
-        query = {"username": data["username"]} # Fallback
-
-    update_fields = {
-        "name": data["name"],
-        "username": data["username"],
-        "password": data["password"]
-    }
-    
-    result = agents_col.update_one(query, {"$set": update_fields})
-    
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Agent not found")
-        
-    return {"status": "agent updated"}
-
-@app.get("/admin/agents")
-def get_agents():
-    agents = list(agents_col.find({}, {"password": 0})) 
-    for a in agents:
-        a["id"] = str(a["_id"])
-        del a["_id"]
-    return agents
-@app.post("/admin/add_agent")
-def add_agent(data: dict):
-    if agents_col.find_one({"username": data["username"]}):
-        raise HTTPException(status_code=400, detail="Agent exists")
-
-    agents_col.insert_one({
-        "name": data["name"],
-        "username": data["username"],
-        "password": data["password"],
-        "created_at": int(time.time())
-    })
-    return {"status": "agent added"}
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from database_async import (
+    tests_col,
+    centers_col,
+    prices_col,
+    bookings_col,
+    admins_col,
+    center_users_col,
+    admins_col,
+    center_users_col,
+    categories_col,
+    notices_col,
+    agents_col,
+    reports_bookings_col
+)
+from joins import resolve_names
+from responses import json_response, not_modified
+from schemas import AdminBooking, Center, CenterBooking, Test
+from streaming import wants_stream, ndjson_response
+from contextlib import asynccontextmanager
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import List
+
+import asyncio
+import auth
+import capture
+import catalog
+import ids
+import math
+import metrics
+import querylog
+import response_compression
+import rollups
+import time
+import warmup
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # A first rollup build must finish before this worker takes writes
+    # (a no-op once done, see rollups.py)
+    await warmup.backfill_rollups()
+    # Serves right away; /ready turns 200 once warmup.py is done
+    task = asyncio.create_task(warmup.run())
+    metrics.start_flusher()
+    yield
+    warmup.READY = False
+    task.cancel()
+    await catalog.stop_watcher()
+    metrics.stop_flusher()
+
+app = FastAPI(lifespan=lifespan)
+
+# Added before CORS so 401/403 responses still get CORS headers
+app.add_middleware(auth.AuthMiddleware)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    # Read by the web build (admin_pricing paging)
+    expose_headers=["X-Total-Count"],
+)
+
+if response_compression.COMPRESSION:
+    app.add_middleware(response_compression.CompressionMiddleware)
+
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+if querylog.ENABLED:
+    app.add_middleware(querylog.QueryLogMiddleware)
+
+# Outermost, so recorded timings include every other middleware
+if capture.ENABLED:
+    app.add_middleware(capture.CaptureMiddleware)
+
+# List endpoints return stored rows as they are, old documents included.
+# Their schemas.py models only document them in OpenAPI: json_response
+# skips a response_model, and with FAST_JSON=0 it would reject legacy rows
+def _documented(model):
+    return {200: {"model": model}}
+
+# ---------------- HOME ----------------
+@app.get("/")
+async def home():
+    return {"status": "SE Booking API running"}
+
+# ---------------- READINESS ----------------
+# 503 until the worker has its connections, indexes and catalog (see
+# warmup.py); point load balancer / readiness probes here, not at "/".
+# The detail carries the last warmup failure, e.g. a missing unique index
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    if not warmup.READY:
+        raise HTTPException(503, warmup.ERROR or "Warming up")
+    return {"status": "ready"}
+
+# ---------------- METRICS ----------------
+# Prometheus text format, see metrics.py
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# ---------------- GET NOTICE ----------------
+@app.get("/get_notice")
+async def get_notice(request: Request, response: Response):
+    cached = not_modified(request, response, await catalog.etag("notices"))
+    if cached:
+        return cached
+
+    notice = await catalog.notice("home_notice")
+    if not notice:
+        return {"text": "", "enabled": False}
+    return notice
+
+# ---------------- UPDATE NOTICE ----------------
+@app.post("/admin/update_notice")
+async def update_notice(data: dict):
+    await notices_col.update_one(
+        {"id": "home_notice"},
+        {
+            "$set": {
+                "text": data.get("text", ""),
+                "enabled": bool(data.get("enabled", False))
+            }
+        },
+        upsert=True
+    )
+    catalog.invalidate("notices")
+    return {"status": "updated"}
+
+# ---------------- GET TESTS ----------------
+@app.get("/get_tests")
+async def get_tests(category_id: int, request: Request, response: Response):
+    cached = not_modified(request, response, await catalog.etag("tests"))
+    if cached:
+        return cached
+
+    return await catalog.tests_by_category(category_id)
+
+
+# ---------------- SEARCH TESTS ----------------
+# Typeahead over test names, from the in-memory index in catalog.py.
+# with_price=true adds min_price: the cheapest enabled offer (None if
+# no enabled center has a price for the test).
+SEARCH_MAX_LIMIT = 50
+
+@app.get("/search_tests")
+async def search_tests(q: str, limit: int = 10, with_price: bool = False):
+    tests = await catalog.search_tests(q, max(0, min(limit, SEARCH_MAX_LIMIT)))
+
+    if with_price:
+        cheapest = await catalog.cheapest_prices()
+        tests = [{**t, "min_price": cheapest.get(t.get("id"))} for t in tests]
+
+    return json_response(tests)
+
+
+# ---------------- GET CENTERS ----------------
+@app.get("/get_centers")
+async def get_centers(test_id: int, sort: str = None):
+    centers = await catalog.centers_for_test(test_id)
+
+    # ?sort=price -> cheapest first
+    if sort == "price":
+        centers = sorted(centers, key=lambda c: c["price"] or 0)
+
+    return centers
+
+
+# ---------------- ADD BOOKING ----------------
+def _new_booking(data, booking_id, current_time):
+    booked_by = data.get("booked_by", "Customer")
+    price = float(data["price"])
+    
+    # Amount paid at booking time
+    paid_amount = float(data.get("paid_amount", 0))
+    
+    # Validation: If legacy 'payment_status'='Paid', assume full price
+    if data.get("payment_status") == "Paid" and paid_amount == 0:
+        paid_amount = price
+
+    agent_collected = 0.0
+    center_collected = 0.0
+
+    # Attribution
+    if booked_by not in ["Customer", "Center"]: 
+        agent_collected = paid_amount
+    elif booked_by == "Center":
+        center_collected = paid_amount
+    
+    # Calculate Status
+    total_paid = agent_collected + center_collected
+    balance_due = price - total_paid
+    
+    input_status = data.get("payment_status", "Unpaid")
+    
+    if "Pending" in input_status:
+        payment_status = input_status
+    elif balance_due <= 0:
+        payment_status = "Paid"
+    elif total_paid > 0:
+        payment_status = "Partial"
+    else:
+        payment_status = "Unpaid"
+
+    booking = {
+        "booking_id": booking_id,
+        "patient_name": data["name"],
+        "mobile": data["mobile"],
+        "age": data.get("age"),
+        "gender": data.get("gender"),
+        "address": data.get("address"),
+        "center_id": data["center_id"],
+        "test_id": data["test_id"],
+        "price": price,
+        "status": "Pending",
+        "created_at": current_time,
+        "booked_by": booked_by,
+        
+        # Payment Breakdown
+        "agent_collected": agent_collected,
+        "center_collected": center_collected,
+        "payment_status": payment_status,
+        "payment_updated_by": booked_by if total_paid > 0 else None,
+        "payment_updated_at": current_time if total_paid > 0 else None
+    }
+    return booking
+
+# ---------------- GENERATED IDS ----------------
+# booking_id / tests.id / categories.id have unique indexes. Two workers
+# sharing a worker id (see ids.py) can generate the same id, so an insert
+# that hits the index gets a fresh id and is retried.
+ID_ATTEMPTS = 3
+
+def _id_clash(code, key_pattern, field):
+    # keyPattern names the index (MongoDB 4.2+)
+    return code == 11000 and (key_pattern is None or field in key_pattern)
+
+async def _insert_with_id(col, doc, field, new_id):
+    for _ in range(ID_ATTEMPTS):
+        try:
+            await col.insert_one(doc)
+            return
+        except DuplicateKeyError as e:
+            if not _id_clash(e.code, (e.details or {}).get("keyPattern"), field):
+                raise
+            doc[field] = new_id()
+    raise HTTPException(status_code=500, detail="Could not allocate an id")
+
+
+@app.post("/add_booking")
+async def add_booking(data: dict):
+    booking = _new_booking(data, ids.new_booking_id(), int(time.time()))
+    await _insert_with_id(bookings_col, booking, "booking_id", ids.new_booking_id)
+
+    await rollups.record(None, booking)
+
+    return {"booking_id": booking["booking_id"]}
+
+
+# ---------------- ADD BOOKINGS (BULK) ----------------
+# Same rules as add_booking for every item, one unordered insert_many.
+# Returns a result per item, in request order.
+MAX_BULK_BOOKINGS = 1000
+
+@app.post("/add_bookings")
+async def add_bookings(data: list = Body(...)):
+    if len(data) > MAX_BULK_BOOKINGS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_BOOKINGS} bookings per request")
+
+    current_time = int(time.time())
+    results = []
+    docs = []
+    positions = []  # docs index -> results index
+
+    for i, item in enumerate(data):
+        try:
+            booking = _new_booking(item, ids.new_booking_id(), current_time)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            results.append({"index": i, "status": "failed", "error": f"Invalid booking: {e!r}"})
+            continue
+
+        results.append({"index": i, "status": "created", "booking_id": booking["booking_id"]})
+        positions.append(i)
+        docs.append(booking)
+
+    if docs:
+        failed = set()
+        pending = list(range(len(docs)))  # docs indexes still to insert
+
+        for attempt in range(ID_ATTEMPTS):
+            try:
+                await bookings_col.insert_many([docs[i] for i in pending], ordered=False)
+                break
+            except BulkWriteError as e:
+                retry = []
+                for err in e.details.get("writeErrors", []):
+                    i = pending[err["index"]]
+                    r = results[positions[i]]
+                    if _id_clash(err.get("code"), err.get("keyPattern"), "booking_id") and attempt < ID_ATTEMPTS - 1:
+                        docs[i]["booking_id"] = r["booking_id"] = ids.new_booking_id()
+                        retry.append(i)
+                        continue
+                    failed.add(i)
+                    r["status"] = "failed"
+                    r["error"] = err.get("errmsg", "write failed")
+                    del r["booking_id"]
+                pending = retry
+                if not pending:
+                    break
+
+        await rollups.record_many([d for i, d in enumerate(docs) if i not in failed])
+
+    created = sum(1 for r in results if r["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+# ---------------- UPDATE PAYMENT DETAILS (New Generic) ----------------
+PAYMENT_FIELDS = ["agent_collected", "center_collected", "admin_collected"]
+
+def _payment_amounts(data):
+    """The PAYMENT_FIELDS sent in `data`, as finite floats (400 otherwise)."""
+    amounts = {}
+    for f in PAYMENT_FIELDS:
+        if f in data:
+            try:
+                amounts[f] = float(data[f])
+            except (TypeError, ValueError):
+                amounts[f] = math.nan
+            if not math.isfinite(amounts[f]) or isinstance(data[f], bool):
+                raise HTTPException(status_code=400, detail=f"{f} must be a number")
+    return amounts
+
+def _payment_update(amounts, updated_by, now):
+    # Aggregation-pipeline update: fields not sent keep their current
+    # value and the status is computed from the stored document, so a
+    # concurrent agent and center update cannot overwrite each other.
+    # payment_previous keeps what the update replaced (the rollups need it)
+    collected = {
+        f: amounts[f] if f in amounts else {"$toDouble": {"$ifNull": [f"${f}", 0]}}
+        for f in PAYMENT_FIELDS
+    }
+    return [
+        {"$set": {
+            "payment_previous": {
+                f: {"$ifNull": [f"${f}", None]} for f in PAYMENT_FIELDS + ["payment_status"]
+            }
+        }},
+        {"$set": {
+            **collected,
+            "payment_updated_by": {"$literal": updated_by},
+            "payment_updated_at": now
+        }},
+        {"$set": {
+            "payment_status": {"$let": {
+                "vars": {
+                    "total_paid": {"$add": [f"${f}" for f in PAYMENT_FIELDS]},
+                    "price": {"$toDouble": {"$ifNull": ["$price", 0]}}
+                },
+                "in": {"$let": {
+                    "vars": {"balance_due": {"$subtract": ["$$price", "$$total_paid"]}},
+                    "in": {"$switch": {
+                        "branches": [
+                            {"case": {"$lte": ["$$balance_due", 0]}, "then": "Paid"},
+                            {"case": {"$gt": ["$$total_paid", 0]}, "then": "Partial"}
+                        ],
+                        "default": "Unpaid"
+                    }}
+                }}
+            }}
+        }}
+    ]
+
+@app.post("/update_payment_details")
+async def update_payment_details(data: dict, request: Request):
+    booking_id = data.get("booking_id")
+
+    # Update provided fields only; checked before anything is written
+    amounts = _payment_amounts(data)
+    updated_by = data.get("updated_by_name", "Admin")
+    now = int(time.time())
+
+    # One atomic round trip. The stored result comes back, with the values
+    # it replaced in payment_previous for the rollups.
+    booking = await bookings_col.find_one_and_update(
+        {"booking_id": booking_id, **auth.booking_filter(request)},
+        _payment_update(amounts, updated_by, now),
+        return_document=ReturnDocument.AFTER
+    )
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    await rollups.record({**booking, **booking["payment_previous"]}, booking)
+    return {"status": "updated", "payment_status": booking["payment_status"]}
+
+
+# ---------------- ADMIN STATS (CENTER WISE) ----------------
+@app.get("/admin/center_stats")
+async def get_center_stats(start_ts: int = None, end_ts: int = None, granularity: str = None):
+    # Summed from center_daily_stats (see rollups.py); a date filter
+    # selects whole days
+    if not await rollups.backfilled():
+        raise HTTPException(status_code=503, detail="Stats are still being built")
+
+    if granularity is not None:
+        return await _center_stats_series(granularity, start_ts, end_ts)
+
+    stats, center_names = await asyncio.gather(
+        rollups.center_totals(start_ts, end_ts),
+        catalog.center_names()
+    )
+    result = []
+    
+    for s in stats:
+        # Resolve Center Name
+        c_id = s["_id"]
+        c_name = None
+        if isinstance(c_id, int) or (isinstance(c_id, str) and c_id.isdigit()):
+            c_name = center_names.get(int(c_id))
+        
+        c_name = c_name if c_name is not None else f"ID: {c_id}"
+
+        result.append({"center_name": c_name, **_stats_row(s)})
+    
+    return result
+
+def _stats_row(s):
+    total_collected = s["agent_collected"] + s["center_collected"] + s["admin_collected"]
+    return {
+        "total_bookings": s["bookings"],
+        "total_revenue": s["revenue"],
+        "paid_count": s["paid_count"],
+        "unpaid_count": s["unpaid_count"] + s["partial_count"],
+        "agent_collected": s["agent_collected"],
+        "center_collected": s["center_collected"],
+        "admin_collected": s["admin_collected"],
+        "total_due": s["revenue"] - total_collected
+    }
+
+# ?granularity=day|week|month -> one series per center
+async def _center_stats_series(granularity, start_ts, end_ts):
+    if granularity not in rollups.GRANULARITIES:
+        raise HTTPException(status_code=400, detail="granularity must be day, week or month")
+
+    result = []
+    for row in await rollups.center_series(granularity, start_ts, end_ts):
+        c_id = row["_id"]
+        result.append({
+            "center_id": c_id,
+            "center_name": row["center"][0]["center_name"] if row["center"] else f"ID: {c_id}",
+            "series": [{"bucket": p["bucket"], **_stats_row(p)} for p in row["series"]]
+        })
+
+    return result
+
+# ---------------- BOOKING HISTORY (NEW) ----------------
+@app.get("/bookings_by_mobile")
+async def bookings_by_mobile(mobile: str):
+    mobile = mobile.strip()
+
+    # Search both string and number (handles old + new data)
+    clauses = [{"mobile": mobile}]
+    if mobile.isdigit():
+        clauses.append({"mobile": int(mobile)})
+    query = {"$or": clauses}
+
+    bookings = await bookings_col.find(
+        query,
+        {"_id": 0, "mobile": 0}
+    ).to_list(None)
+
+    test_names, center_names = await resolve_names()
+
+    result = []
+    for b in bookings:
+        result.append({
+            "booking_id": b["booking_id"],
+            "patient_name": b["patient_name"],
+            "test_name": test_names.get(b["test_id"], ""),
+            "center_name": center_names.get(b["center_id"], ""),
+            "price": b["price"],
+            "status": b["status"],
+            "date": b["created_at"],
+            "payment_status": b.get("payment_status", "Unpaid"),
+            "agent_collected": b.get("agent_collected", 0),
+            "center_collected": b.get("center_collected", 0)
+        })
+
+    return result
+# ================= PASSWORDS =================
+# PBKDF2 is CPU-bound, keep it off the event loop
+async def _hash_password(password):
+    if not isinstance(password, str):
+        raise HTTPException(status_code=400, detail="password must be a string")
+    return await asyncio.to_thread(auth.hash_password, password)
+
+async def _check_password(col, user, password):
+    stored = user.get("password")
+    if not await asyncio.to_thread(auth.verify_password, stored, password):
+        return False
+
+    # Legacy plain-text row: store the hash now that we know the password
+    if not auth.is_hashed(stored):
+        await col.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password": await _hash_password(password)}}
+        )
+    return True
+
+# ================= ADMIN LOGIN =================
+@app.post("/admin/login")
+async def admin_login(data: dict):
+    admin = await admins_col.find_one({"username": data.get("username")})
+
+    if not admin or not await _check_password(admins_col, admin, data.get("password")):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    return {
+        "status": "success",
+        "token": auth.issue_token("admin", admin["username"])
+    }
+# ================= ADD TEST =================
+@app.post("/admin/add_test")
+async def add_test(data: dict):
+    if await tests_col.find_one({"test_name": data["test_name"]}):
+        raise HTTPException(status_code=400, detail="Test already exists")
+
+    await _insert_with_id(tests_col, {
+        "id": ids.next_id(),
+        "category_id": data["category_id"],
+        "test_name": data["test_name"]
+    }, "id", ids.next_id)
+    catalog.invalidate("tests")
+    return {"status": "test added"}
+
+# ================= ADD CENTER =================
+@app.post("/admin/add_center")
+async def add_center(data: dict):
+    if await centers_col.find_one({"id": data["id"]}):
+        raise HTTPException(status_code=400, detail="Center exists")
+
+    await centers_col.insert_one({
+        "id": data["id"],
+        "center_name": data["center_name"],
+        "address": data["address"],
+        "lat": data.get("lat"),
+        "lng": data.get("lng"),
+        "timings": data.get("timings", []),
+        "enabled": True
+    })
+    catalog.invalidate("centers")
+
+    return {"status": "center added"}
+
+# ================= SET PRICE (ASSIGN TEST TO CENTER) =================
+@app.post("/admin/set_price")
+async def set_price(data: dict):
+    await prices_col.update_one(
+        {
+            "center_id": int(data["center_id"]),
+            "test_id": int(data["test_id"])
+        },
+        {
+            "$set": {
+                "price": float(data["price"]),
+                "enabled": bool(data.get("enabled", True))
+            }
+        },
+        upsert=True
+    )
+    catalog.invalidate("prices")
+    return {"status": "price updated"}
+
+# ================= CENTER LOGIN =================
+@app.post("/center/login")
+async def center_login(data: dict):
+    user = await center_users_col.find_one({"username": data.get("username")})
+
+    if not user or not await _check_password(center_users_col, user, data.get("password")):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    center = await catalog.center(user["center_id"])
+
+    return {
+        "center_id": user["center_id"],
+        "center_name": center["center_name"] if center else "",
+        "token": auth.issue_token("center", user["username"], center_id=user["center_id"])
+    }
+
+@app.get("/center/bookings", responses=_documented(List[CenterBooking]))
+async def center_bookings(center_id: int, request: Request):
+    auth.check_center(request, center_id)
+
+    query = {
+        "$or": [
+            {"center_id": center_id},
+            {"center_id": str(center_id)}
+        ]
+    }
+
+    # Sort DESC
+    bookings = await bookings_col.find(
+        query,
+        {"_id": 0, "mobile": 0}
+    ).sort("created_at", -1).to_list(None)
+
+    test_names, _ = await resolve_names(centers=False)
+
+    result = []
+    for b in bookings:
+        result.append({
+            "booking_id": b.get("booking_id"),
+            "patient_name": b.get("patient_name"),
+            "test_name": test_names.get(b.get("test_id"), ""),
+            "price": b.get("price"),
+            "status": b.get("status"),
+            "created_at": b.get("created_at"),
+            "booked_by": b.get("booked_by", "Customer"),
+            "payment_status": b.get("payment_status", "Unpaid"),
+            "payment_updated_by": b.get("payment_updated_by"),
+            "agent_collected": b.get("agent_collected", 0),
+            "center_collected": b.get("center_collected", 0)
+        })
+
+    return json_response(result)
+
+def _agent_booking_row(b, test_names, center_names):
+    return {
+        "booking_id": b.get("booking_id"),
+        "patient_name": b.get("patient_name"),
+        "mobile": b.get("mobile"),
+        "test_name": test_names.get(b.get("test_id"), ""),
+        "center_name": center_names.get(b.get("center_id"), ""),
+        "price": b.get("price"),
+        "status": b.get("status"),
+        "created_at": b.get("created_at"),
+        "payment_status": b.get("payment_status", "Unpaid"),
+        "payment_updated_by": b.get("payment_updated_by"),
+        "agent_collected": b.get("agent_collected", 0),
+        "center_collected": b.get("center_collected", 0)
+    }
+
+@app.get("/agent/bookings")
+async def agent_bookings(agent_name: str, request: Request, stream: int = 0):
+    auth.check_agent(request, agent_name)
+
+    # Sort DESC
+    cursor = bookings_col.find(
+        {"booked_by": agent_name},
+        {"_id": 0}
+    ).sort("created_at", -1)
+
+    if wants_stream(request, stream):
+        return ndjson_response(cursor, _agent_booking_row)
+
+    bookings = await cursor.to_list(None)
+    test_names, center_names = await resolve_names()
+
+    return [_agent_booking_row(b, test_names, center_names) for b in bookings]
+
+# ================= MARK BOOKING DONE =================
+@app.post("/center/mark_done")
+async def mark_done(data: dict, request: Request):
+    result = await bookings_col.update_one(
+        {"booking_id": data.get("booking_id"), **auth.booking_filter(request)},
+        {"$set": {"status": "Done"}}
+    )
+
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    return {"status": "updated"}
+@app.get("/admin/centers", responses=_documented(List[Center]))
+async def admin_get_centers():
+    return json_response(await catalog.centers())
+
+@app.get("/admin/tests", responses=_documented(List[Test]))
+async def admin_get_tests(request: Request, response: Response):
+    cached = not_modified(request, response, await catalog.etag("tests"))
+    if cached:
+        return cached
+
+    return json_response(await catalog.tests(), response)
+
+@app.get("/admin/pricing")
+async def admin_pricing(
+    center_id: int,
+    response: Response,
+    category_id: int = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(None, ge=1)
+):
+    tests, int_rows, str_rows = await asyncio.gather(
+        catalog.tests(),
+        catalog.prices_for_center(center_id),
+        catalog.prices_for_center(str(center_id))
+    )
+
+    # center_id may be stored as int or string; prefer the int row
+    price_rows = {}
+    for p in int_rows + str_rows:
+        price_rows.setdefault(p.get("test_id"), p)
+
+    if category_id is not None:
+        tests = [t for t in tests if t.get("category_id") == category_id]
+
+    # Optional paging; X-Total-Count has the unpaged size
+    response.headers["X-Total-Count"] = str(len(tests))
+    tests = tests[offset:offset + limit] if limit is not None else tests[offset:]
+
+    result = []
+    for t in tests:
+        price_row = price_rows.get(t.get("id"))
+
+        result.append({
+            "test_id": t.get("id"),
+            "test_name": t.get("test_name", ""),
+            "category_id": t.get("category_id"),
+            "price": price_row.get("price") if price_row else "",
+            "enabled": price_row.get("enabled", False) if price_row else False
+        })
+
+    return result
+
+
+
+@app.get("/admin/center_users")
+async def get_center_users():
+    return await center_users_col.find({}, {"_id": 0, "password": 0}).to_list(None)
+@app.post("/admin/create_center_user")
+async def create_center_user(data: dict):
+    if await center_users_col.find_one({"username": data["username"]}):
+        raise HTTPException(status_code=400, detail="Username already exists")
+
+    await center_users_col.insert_one({
+        "center_id": int(data["center_id"]),
+        "username": data["username"],
+        "password": await _hash_password(data["password"])
+    })
+
+    return {"status": "center user created"}
+
+# ================= ADD CATEGORY =================
+@app.post("/admin/add_category")
+async def add_category(data: dict):
+    if await categories_col.find_one({"name": data["name"]}):
+        raise HTTPException(status_code=400, detail="Category exists")
+
+    await _insert_with_id(categories_col, {
+        "id": ids.next_id(),
+        "name": data["name"]
+    }, "id", ids.next_id)
+    catalog.invalidate("categories")
+    return {"status": "category added"}
+
+
+# ================= GET CATEGORIES =================
+@app.get("/admin/categories")
+async def get_categories(request: Request, response: Response):
+    cached = not_modified(request, response, await catalog.etag("categories"))
+    if cached:
+        return cached
+
+    return await catalog.categories()
+
+# UPDATE CENTER DETAILS
+@app.post("/admin/update_center")
+async def update_center(data: dict):
+    update_data = {
+        "center_name": data["center_name"],
+        "address": data["address"],
+    }
+
+    if "lat" in data and data["lat"] is not None:
+        update_data["lat"] = float(data["lat"])
+
+    if "lng" in data and data["lng"] is not None:
+        update_data["lng"] = float(data["lng"])
+
+    if "timings" in data:
+        update_data["timings"] = data["timings"]
+
+    result = await centers_col.update_one(
+        {"id": int(data["id"])},
+        {"$set": update_data}
+    )
+    catalog.invalidate("centers")
+
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Center not found")
+
+    return {"status": "center updated"}
+
+
+@app.post("/admin/update_center_user")
+async def update_center_user(data: dict):
+    result = await center_users_col.update_one(
+        {"center_id": int(data["center_id"])},
+        {"$set": {
+            "username": data["username"],
+            "password": await _hash_password(data["password"])
+        }}
+    )
+
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Center user not found")
+
+    return {"status": "center user updated"}
+
+@app.post("/admin/update_test")
+async def update_test(data: dict):
+    result = await tests_col.update_one(
+        {"id": int(data["test_id"])},
+        {"$set": {"test_name": data["test_name"]}}
+    )
+    catalog.invalidate("tests")
+    return {"status": "updated"}
+
+@app.post("/admin/toggle_center")
+async def toggle_center(data: dict):
+    result = await centers_col.update_one(
+        {"id": int(data["center_id"])},
+        {"$set": {"enabled": bool(data["enabled"])}}
+    )
+    catalog.invalidate("centers")
+
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Center not found")
+
+    return {"status": "updated"}
+
+
+def _admin_booking_row(b, test_names, center_names):
+    return {
+        "booking_id": b["booking_id"],
+        "patient_name": b["patient_name"],
+        "mobile": b["mobile"],
+        "age": b.get("age"),
+        "gender": b.get("gender"),
+        "address": b.get("address"),
+        "test_name": test_names.get(b["test_id"], ""),
+        "center_name": center_names.get(b["center_id"], ""),
+        "status": b["status"],
+        "created_at": b["created_at"],
+        "booked_by": b.get("booked_by", "Customer"),
+        "payment_status": b.get("payment_status", "Unpaid"),
+        "payment_updated_by": b.get("payment_updated_by"),
+        "payment_updated_at": b.get("payment_updated_at"),
+        "agent_collected": b.get("agent_collected", 0),
+        "center_collected": b.get("center_collected", 0),
+        "admin_collected": b.get("admin_collected", 0),
+        "price": b.get("price", 0)
+    }
+
+def _either_type(value):
+    # ids may be stored as int or string
+    return {"$in": [value, str(value)]}
+
+
+def _or_missing(value, default):
+    # Old bookings lack the field; rows report them as the default
+    return {"$in": [value, None]} if value == default else value
+
+
+def _admin_bookings_query(start_ts, end_ts, center_id, status, payment_status, booked_by, test_id):
+    query = {}
+    if start_ts is not None or end_ts is not None:
+        query["created_at"] = {}
+        if start_ts is not None:
+            query["created_at"]["$gte"] = start_ts
+        if end_ts is not None:
+            query["created_at"]["$lte"] = end_ts
+    if center_id is not None:
+        query["center_id"] = _either_type(center_id)
+    if test_id is not None:
+        query["test_id"] = _either_type(test_id)
+    if status is not None:
+        query["status"] = status
+    if payment_status is not None:
+        query["payment_status"] = _or_missing(payment_status, "Unpaid")
+    if booked_by is not None:
+        query["booked_by"] = _or_missing(booked_by, "Customer")
+    return query
+
+
+@app.get("/admin/bookings", responses=_documented(List[AdminBooking]))
+async def admin_all_bookings(
+    request: Request,
+    stream: int = 0,
+    start_ts: int = None,
+    end_ts: int = None,
+    center_id: int = None,
+    status: str = None,
+    payment_status: str = None,
+    booked_by: str = None,
+    test_id: int = None
+):
+    # Every filter is optional; created_at window is inclusive
+    query = _admin_bookings_query(start_ts, end_ts, center_id, status, payment_status, booked_by, test_id)
+
+    # Sort by created_at descending (-1); report read, secondary preferred
+    cursor = reports_bookings_col.find(query, {"_id": 0}).sort("created_at", -1)
+
+    # ?stream=1 or Accept: application/x-ndjson -> one booking per line
+    if wants_stream(request, stream):
+        return ndjson_response(cursor, _admin_booking_row)
+
+    bookings = await cursor.to_list(None)
+    test_names, center_names = await resolve_names()
+
+    return json_response([_admin_booking_row(b, test_names, center_names) for b in bookings])
+
+
+# ================= AGENT SECTION =================
+
+@app.post("/agent/login")
+async def agent_login(data: dict):
+    agent = await agents_col.find_one({"username": data.get("username")})
+
+    if not agent or not await _check_password(agents_col, agent, data.get("password")):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    return {
+        "agent_id": str(agent["_id"]),
+        "agent_name": agent["name"],
+        "token": auth.issue_token(
+            "agent", agent["username"],
+            agent_id=str(agent["_id"]), agent_name=agent["name"]
+        )
+    }
+
+@app.post("/center/update_payment_status")
+async def update_payment(data: dict, request: Request):
+    # This endpoint is used by Center AND Admin
+    # Admin or Center can pass "updated_by_name"
+    updater_name = data.get("updated_by_name", "Center")
+    changes = {
+        "payment_status": data.get("payment_status"),
+        "payment_updated_by": updater_name,
+        "payment_updated_at": int(time.time())
+    }
+
+    # Previous version is needed to move the rollup count between statuses
+    before = await bookings_col.find_one_and_update(
+        {"booking_id": data.get("booking_id"), **auth.booking_filter(request)},
+        {"$set": changes}
+    )
+    if before is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    await rollups.record(before, {**before, **changes})
+    return {"status": "updated"}
+
+@app.post("/admin/update_agent")
+async def update_agent(data: dict):
+    # Use username as key for now or pass _id if available
+    # Assuming user sends old_username to find and update
+    query = {}
+    if "id" in data:
+        from bson.objectid import ObjectId
+        query = {"_id": ObjectId(data["id"])}
+    else:
+        query = {"username": data["username"]} # Fallback
+
+    update_fields = {
+        "name": data["name"],
+        "username": data["username"],
+        "password": await _hash_password(data["password"])
+    }
+    
+    result = await agents_col.update_one(query, {"$set": update_fields})
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Agent not found")
+        
+    return {"status": "agent updated"}
+
+@app.get("/admin/agents")
+async def get_agents():
+    agents = await agents_col.find({}, {"password": 0}).to_list(None)
+    for a in agents:
+        a["id"] = str(a["_id"])
+        del a["_id"]
+    return agents
+@app.post("/admin/add_agent")
+async def add_agent(data: dict):
+    if await agents_col.find_one({"username": data["username"]}):
+        raise HTTPException(status_code=400, detail="Agent exists")
+
+    await agents_col.insert_one({
+        "name": data["name"],
+        "username": data["username"],
+        "password": await _hash_password(data["password"]),
+        "created_at": int(time.time())
+    })
+    return {"status": "agent added"}
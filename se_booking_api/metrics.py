@@ -0,0 +1,358 @@
+from pymongo import monitoring
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+log = logging.getLogger("se_booking.metrics")
+
+# ---------------- METRICS ----------------
+# Prometheus text format at /metrics, summed over the workers when
+# METRICS_DIR is set (see WORKERS below):
+#
+#   http_request_duration_seconds   histogram by method, route
+#   http_requests_total             counter by method, route, status
+#   http_requests_in_flight         gauge by method, route
+#   mongo_command_duration_seconds  histogram by command, collection
+#   mongo_command_failures_total    counter by command, collection
+#   mongo_pool_*                    connection pool size and use per server
+#
+# Mongo numbers come from pymongo event listeners (MONGO_LISTENERS, given
+# to the client in database_async.py). METRICS=0 turns all of it off.
+
+ENABLED = os.getenv("METRICS", "1") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Paths that match no route share one label value
+OTHER_ROUTE = "other"
+
+
+def _label_text(names, values):
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return ",".join(pairs)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self, values=None):
+        for labels, value in (self.values if values is None else values).items():
+            yield self.name, _label_text(self.labels, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels, value):
+        self.values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def samples(self, values=None):
+        for labels, row in (self.values if values is None else values).items():
+            base = _label_text(self.labels, labels)
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, row):
+                yield f"{self.name}_bucket", f'{base}{sep}le="{bound}"', count
+            yield f"{self.name}_bucket", f'{base}{sep}le="+Inf"', row[-1]
+            yield f"{self.name}_sum", base, row[-2]
+            yield f"{self.name}_count", base, row[-1]
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency, first byte in to last byte out.", ("method", "route"))
+requests_total = Counter(
+    "http_requests_total", "Finished requests.", ("method", "route", "status"))
+in_flight = Gauge(
+    "http_requests_in_flight", "Requests being handled right now.", ("method", "route"))
+
+mongo_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trips.", ("command", "collection"))
+mongo_failures = Counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error.", ("command", "collection"))
+
+pool_max_size = Gauge(
+    "mongo_pool_max_size", "maxPoolSize of the connection pool.", ("address",))
+pool_open = Gauge(
+    "mongo_pool_connections", "Open connections in the pool.", ("address",))
+pool_checked_out = Gauge(
+    "mongo_pool_checked_out", "Connections in use by an operation.", ("address",))
+pool_wait = Histogram(
+    "mongo_pool_checkout_seconds", "Time spent waiting for a pooled connection.", ("address",))
+pool_checkout_failures = Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed or timed out.", ("address", "reason"))
+
+REGISTRY = [
+    request_duration, requests_total, in_flight,
+    mongo_duration, mongo_failures,
+    pool_max_size, pool_open, pool_checked_out, pool_wait, pool_checkout_failures,
+]
+
+
+def render():
+    merged = _merged() if METRICS_DIR else {}
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples(merged.get(metric.name)):
+            lines.append(f"{name}{{{labels}}} {_number(value)}" if labels else f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- WORKERS ----------------
+# serve.py runs several workers and a scrape reaches any one of them. It
+# sets METRICS_DIR to a directory shared by its workers: each writes its
+# values to a file there every METRICS_FLUSH_S seconds and on shutdown,
+# and /metrics answers with the sum over all files (the answering
+# worker's own values are current, the others' up to METRICS_FLUSH_S
+# old). Files of workers that have exited keep their counters and
+# histograms, so totals never go down, but not their gauges.
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+FLUSH_S = float(os.getenv("METRICS_FLUSH_S", "5"))
+
+_file = None  # this worker's file, named after fork
+_flush_task = None
+
+
+def _own_file():
+    global _file
+    if _file is None:
+        # Start time too: a later worker may get the same pid
+        _file = os.path.join(METRICS_DIR, f"{os.getpid()}-{time.time_ns()}.json")
+    return _file
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_snapshot(gauges=True):
+    path = _own_file()
+    data = {
+        "pid": os.getpid(),
+        "metrics": {
+            m.name: [[list(labels), value] for labels, value in m.values.items()]
+            for m in REGISTRY if gauges or m.kind != "gauge"
+        },
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _add(totals, metric, labels, value):
+    if metric.kind == "histogram":
+        row = totals.get(labels)
+        totals[labels] = value[:] if row is None else [a + b for a, b in zip(row, value)]
+    else:
+        totals[labels] = totals.get(labels, 0) + value
+
+
+def _merged():
+    own = _own_file()
+    totals = {m.name: {} for m in REGISTRY}
+    for metric in REGISTRY:
+        for labels, value in metric.values.items():
+            _add(totals[metric.name], metric, labels, value[:] if metric.kind == "histogram" else value)
+
+    for name in os.listdir(METRICS_DIR):
+        path = os.path.join(METRICS_DIR, name)
+        if not name.endswith(".json") or path == own:
+            continue
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        alive = _alive(data["pid"])
+        for metric in REGISTRY:
+            if metric.kind == "gauge" and not alive:
+                continue
+            for labels, value in data["metrics"].get(metric.name, []):
+                _add(totals[metric.name], metric, tuple(labels), value)
+    return totals
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(FLUSH_S)
+        try:
+            write_snapshot()
+        except OSError as e:
+            log.warning("metrics snapshot not written: %s", e)
+
+
+def start_flusher():
+    global _flush_task
+    if ENABLED and METRICS_DIR and _flush_task is None:
+        write_snapshot()
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+def stop_flusher():
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
+        # Nothing is in flight any more; the counts stay
+        write_snapshot(gauges=False)
+
+
+# ---------------- HTTP ----------------
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.routes = None
+
+    def _route(self, scope):
+        if self.routes is None:
+            self.routes = {getattr(r, "path", None) for r in scope["app"].routes}
+        return scope["path"] if scope["path"] in self.routes else OTHER_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        key = (scope["method"], self._route(scope))
+        status = 500
+        start = time.perf_counter()
+
+        async def send_observed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc(key)
+        try:
+            await self.app(scope, receive, send_observed)
+        finally:
+            in_flight.inc(key, -1)
+            request_duration.observe(key, time.perf_counter() - start)
+            requests_total.inc(key + (status,))
+
+
+# ---------------- MONGO ----------------
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}  # (connection_id, request_id) -> collection
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def _labels(self, event):
+        return (event.command_name, self._collections.pop((event.connection_id, event.request_id), ""))
+
+    def succeeded(self, event):
+        mongo_duration.observe(self._labels(event), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._labels(event)
+        mongo_duration.observe(labels, event.duration_micros / 1e6)
+        mongo_failures.inc(labels)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self, max_pool_size):
+        self.max_pool_size = max_pool_size
+
+    def pool_created(self, event):
+        address = (_address(event),)
+        pool_max_size.set(address, event.options.get("maxPoolSize", self.max_pool_size))
+        pool_open.set(address, 0)
+        pool_checked_out.set(address, 0)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        address = (_address(event),)
+        pool_open.set(address, 0)
+        pool_checked_out.set(address, 0)
+
+    def connection_created(self, event):
+        pool_open.inc((_address(event),))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_open.inc((_address(event),), -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pool_checkout_failures.inc((_address(event), event.reason))
+        pool_wait.observe((_address(event),), event.duration)
+
+    def connection_checked_out(self, event):
+        pool_checked_out.inc((_address(event),))
+        pool_wait.observe((_address(event),), event.duration)
+
+    def connection_checked_in(self, event):
+        pool_checked_out.inc((_address(event),), -1)
+
+
+# 100 is pymongo's default maxPoolSize
+MONGO_LISTENERS = [CommandMetrics(), PoolMetrics(100)] if ENABLED else []
@@ -0,0 +1,101 @@
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+import os
+
+# ---------------- MONGO CLIENT OPTIONS ----------------
+# Used by database_async.py. Only variables that are set
+# are passed, so options in MONGO_URL still apply otherwise.
+#
+#   MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE   connections per server, per process
+#   MONGO_MAX_IDLE_TIME_MS                      close pooled connections idle this long
+#   MONGO_COMPRESSORS                           e.g. "zstd,snappy,zlib"; zstd needs
+#                                               pymongo[zstd], snappy pymongo[snappy],
+#                                               unavailable ones are skipped by pymongo
+#   MONGO_ZLIB_LEVEL                            -1..9
+#   MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+#   MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+#   MONGO_TIMEOUT_MS                            (client-side operation timeout)
+
+OPTIONS = [
+    ("MONGO_MAX_POOL_SIZE", "maxPoolSize", int),
+    ("MONGO_MIN_POOL_SIZE", "minPoolSize", int),
+    ("MONGO_MAX_IDLE_TIME_MS", "maxIdleTimeMS", int),
+    ("MONGO_COMPRESSORS", "compressors", str),
+    ("MONGO_ZLIB_LEVEL", "zlibCompressionLevel", int),
+    ("MONGO_CONNECT_TIMEOUT_MS", "connectTimeoutMS", int),
+    ("MONGO_SOCKET_TIMEOUT_MS", "socketTimeoutMS", int),
+    ("MONGO_SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS", int),
+    ("MONGO_WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS", int),
+    ("MONGO_TIMEOUT_MS", "timeoutMS", int),
+]
+
+
+def client_options():
+    options = {}
+    for env, name, cast in OPTIONS:
+        value = os.getenv(env)
+        if value:
+            options[name] = cast(value)
+    return options
+
+
+# ---------------- REPORT READS ----------------
+# Report queries (/admin/center_stats, /admin/bookings) read through a
+# handle with MONGO_REPORTS_READ_PREFERENCE (default secondaryPreferred),
+# so they run on a secondary when the deployment has one.
+# MONGO_REPORTS_MAX_STALENESS_S (>= 90) skips secondaries lagging further.
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def reports_read_preference():
+    mode = os.getenv("MONGO_REPORTS_READ_PREFERENCE", "secondaryPreferred")
+    if mode not in READ_PREFERENCES:
+        raise Exception(f"MONGO_REPORTS_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}")
+
+    if mode == "primary":
+        return Primary()
+    max_staleness = int(os.getenv("MONGO_REPORTS_MAX_STALENESS_S", "-1"))
+    return READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+
+# ---------------- LAZY HANDLES ----------------
+# Clients, databases and collections are module attributes that the rest
+# of the app imports by name. Lazy builds the real object on first use, so
+# importing the app needs no MONGO_URL and opens nothing (a preloading
+# gunicorn master never creates a client its workers would inherit).
+
+class Lazy:
+    def __init__(self, build):
+        self._build = build
+        self._target = None
+
+    def resolve(self):
+        if self._target is None:
+            self._target = self._build()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __getitem__(self, name):
+        return self.resolve()[name]
+
+
+def mongo_url():
+    url = os.getenv("MONGO_URL")
+    if not url:
+        raise Exception("MONGO_URL not set")
+    return url
@@ -0,0 +1,203 @@
+from pymongo import monitoring
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+
+log = logging.getLogger("se_booking.querylog")
+
+# ---------------- QUERY LOG ----------------
+# QUERY_LOG=1 counts the Mongo commands each request runs, for a
+# QUERY_LOG_SAMPLE fraction of requests (default all; use e.g. 0.01 in
+# production). Two warnings come out of it:
+#
+#   - a request that ran more than QUERY_LOG_MAX_COMMANDS commands, with
+#     its route and the query shapes it repeated (the N+1 pattern)
+#   - a command slower than QUERY_LOG_SLOW_MS, with its query shape and
+#     the winning plan from explain (each shape explained at most once
+#     per EXPLAIN_INTERVAL)
+#
+# A query shape is the command, collection and filter with every value
+# replaced by "?". Cursor batches (getMore) are not counted.
+
+ENABLED = os.getenv("QUERY_LOG", "0") == "1"
+SAMPLE_RATE = float(os.getenv("QUERY_LOG_SAMPLE", "1"))
+MAX_COMMANDS = int(os.getenv("QUERY_LOG_MAX_COMMANDS", "20"))
+SLOW_MS = float(os.getenv("QUERY_LOG_SLOW_MS", "200"))
+EXPLAIN = os.getenv("QUERY_LOG_EXPLAIN", "1") == "1"
+
+EXPLAIN_INTERVAL = 600
+
+IGNORED = {
+    "getMore", "killCursors", "endSessions", "explain",
+    "hello", "isMaster", "ismaster", "ping", "saslStart", "saslContinue",
+}
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# {"route", "count", "shapes"} of the sampled request being handled, else None
+_request = contextvars.ContextVar("querylog_request", default=None)
+
+_explained = {}  # shape -> last explain time
+_tasks = set()
+
+
+# ---------------- QUERY SHAPES ----------------
+
+def _shape(value):
+    if isinstance(value, dict):
+        return {k: _shape(v) for k, v in value.items()}
+    if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+        return [_shape(v) for v in value]
+    return "?"
+
+
+def _filter(name, command):
+    if name == "find":
+        return _shape(command.get("filter", {}))
+    if name in ("count", "distinct", "findAndModify"):
+        return _shape(command.get("query", {}))
+    if name in ("update", "delete"):
+        ops = command.get(name + "s") or [{}]
+        return _shape(ops[0].get("q", {}))
+    if name == "aggregate":
+        stages = command.get("pipeline", [])
+        match = stages[0].get("$match") if stages else None
+        return {
+            "$match": _shape(match) if match is not None else None,
+            "stages": [next(iter(stage), "?") for stage in stages],
+        }
+    return None
+
+
+def query_shape(name, command):
+    target = command.get(name)
+    collection = target if isinstance(target, str) else ""
+    flt = _filter(name, command)
+    return f"{name} {collection} {json.dumps(flt, sort_keys=True)}" if flt is not None else f"{name} {collection}"
+
+
+# ---------------- EXPLAIN ----------------
+
+def _winning_plan(doc):
+    if isinstance(doc, dict):
+        if "winningPlan" in doc:
+            plan = doc["winningPlan"]
+            return plan.get("queryPlan", plan)
+        values = doc.values()
+    elif isinstance(doc, list):
+        values = doc
+    else:
+        return None
+    for value in values:
+        plan = _winning_plan(value)
+        if plan is not None:
+            return plan
+    return None
+
+
+def plan_summary(explain):
+    """"FETCH <- IXSCAN center_id_1_created_at_-1" style, root stage first."""
+    plan = _winning_plan(explain)
+    parts = []
+    while isinstance(plan, dict) and "stage" in plan:
+        parts.append(plan["stage"] + (f" {plan['indexName']}" if "indexName" in plan else ""))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(parts) or "no plan"
+
+
+async def _explain(database_name, command, message):
+    # Not part of any request: keeps the explain itself out of the counts
+    _request.set(None)
+    from database_async import client
+
+    name = next(iter(command))
+    cmd = {
+        k: v for k, v in command.items()
+        if not k.startswith("$") and k not in ("lsid", "txnNumber", "autocommit", "startTransaction")
+    }
+    try:
+        explain = await client[database_name].command({"explain": cmd, "verbosity": "queryPlanner"})
+        log.warning("%s | plan: %s", message, plan_summary(explain))
+    except Exception as e:
+        log.warning("%s | explain %s failed: %s", message, name, e)
+
+
+def _slow(database_name, command, shape, state, ms):
+    message = f"slow command {ms:.0f} ms on {state['method']} {state['route']}: {shape}"
+    name = next(iter(command))
+
+    now = time.monotonic()
+    if not EXPLAIN or name not in EXPLAINABLE or now - _explained.get(shape, -EXPLAIN_INTERVAL) < EXPLAIN_INTERVAL:
+        log.warning(message)
+        return
+    _explained[shape] = now
+
+    try:
+        task = asyncio.get_running_loop().create_task(_explain(database_name, command, message))
+    except RuntimeError:
+        log.warning(message)
+        return
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+class QueryLogListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}  # (connection_id, request_id) -> (shape, command, database, state)
+
+    def started(self, event):
+        state = _request.get()
+        if state is None or event.command_name in IGNORED:
+            return
+
+        shape = query_shape(event.command_name, event.command)
+        state["count"] += 1
+        state["shapes"][shape] = state["shapes"].get(shape, 0) + 1
+        self._pending[(event.connection_id, event.request_id)] = (shape, event.command, event.database_name, state)
+
+    def succeeded(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending and event.duration_micros >= SLOW_MS * 1000:
+            shape, command, database_name, state = pending
+            _slow(database_name, command, shape, state, event.duration_micros / 1000)
+
+    def failed(self, event):
+        self._pending.pop((event.connection_id, event.request_id), None)
+
+
+MONGO_LISTENERS = [QueryLogListener()] if ENABLED else []
+
+
+# ---------------- MIDDLEWARE ----------------
+
+class QueryLogMiddleware:
+    def __init__(self, app, sample_rate=SAMPLE_RATE, max_commands=MAX_COMMANDS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.max_commands = max_commands
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            return await self.app(scope, receive, send)
+
+        state = {"method": scope["method"], "route": scope["path"], "count": 0, "shapes": {}}
+        token = _request.set(state)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request.reset(token)
+
+        if state["count"] > self.max_commands:
+            repeated = sorted(
+                ((n, shape) for shape, n in state["shapes"].items() if n > 1), reverse=True
+            )
+            log.warning(
+                "%s %s ran %d Mongo commands (limit %d); repeated: %s",
+                state["method"], state["route"], state["count"], self.max_commands,
+                "; ".join(f"{n}x {shape}" for n, shape in repeated[:5]) or "none",
+            )
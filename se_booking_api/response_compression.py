@@ -0,0 +1,158 @@
+from starlette.datastructures import Headers, MutableHeaders
+
+import asyncio
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+# ---------------- RESPONSE COMPRESSION ----------------
+# gzip (and brotli when the package is installed) for JSON / NDJSON / text
+# responses. Bodies under COMPRESSION_MIN_SIZE go out as they are.
+#
+# Streamed responses are compressed chunk by chunk with a sync flush, so
+# every NDJSON batch still reaches the client as soon as it is read.
+# 304s and other empty bodies are never touched. Compressed responses
+# get "Vary: Accept-Encoding" and a weak ETag, so conditional GETs keep
+# matching whatever encoding the client got the first time.
+
+COMPRESSION = os.getenv("COMPRESSION", "1") == "1"
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Server preference, first match wins
+ENCODINGS = [
+    e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",")
+    if e.strip() == "gzip" or (e.strip() == "br" and brotli is not None)
+]
+
+# Bodies at least this big are compressed off the event loop
+THREAD_MIN_SIZE = 256 * 1024
+
+COMPRESSIBLE = ("application/json", "application/x-ndjson", "text/")
+
+
+class _Gzip:
+    def __init__(self, level=GZIP_LEVEL):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        return self._c.compress(data) + self._c.flush()
+
+
+class _Brotli:
+    def __init__(self, quality=BROTLI_QUALITY):
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data=b""):
+        return self._c.process(data) + self._c.finish()
+
+
+COMPRESSORS = {"gzip": _Gzip, "br": _Brotli}
+
+
+def choose_encoding(accept_encoding, encodings=ENCODINGS):
+    """Pick the first of `encodings` the Accept-Encoding header allows."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def _compressible(headers):
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE) and "content-encoding" not in headers
+
+
+def _add_vary(headers):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = vary + ", Accept-Encoding"
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=MIN_SIZE, encodings=ENCODINGS):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            return await self.app(scope, receive, send)
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+
+            if message["type"] == "http.response.start":
+                # Held back until the first body tells us the size
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                compress = (
+                    _compressible(headers)
+                    and start["status"] not in (204, 206, 304)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if _compressible(headers):
+                    _add_vary(headers)
+
+                if compress and encoding:
+                    compressor = COMPRESSORS[encoding]()
+                    headers["Content-Encoding"] = encoding
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = "W/" + etag
+
+                await send(start)
+                start = None
+
+            if compressor is None:
+                return await send(message)
+
+            step = compressor.chunk if more_body else compressor.finish
+            if len(body) >= THREAD_MIN_SIZE:
+                data = await asyncio.to_thread(step, body)
+            else:
+                data = step(body)
+
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,69 @@
+from fastapi.responses import Response
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to json
+    orjson = None
+
+# ---------------- FAST JSON ----------------
+# Large list endpoints return json_response(rows): the body is rendered
+# straight to bytes, skipping FastAPI's jsonable_encoder walk.
+# FAST_JSON=0 returns plain lists instead.
+
+FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
+
+
+def dumps(content):
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def json_response(rows, response=None):
+    """Render rows now; `response` is the endpoint's injected Response,
+    whose headers (ETag etc.) are copied over."""
+    if not FAST_JSON:
+        return rows
+
+    rendered = FastJSONResponse(rows)
+    if response is not None:
+        rendered.headers.raw.extend(response.headers.raw)
+    return rendered
+
+
+# ---------------- CONDITIONAL GET ----------------
+# Catalog endpoints send an ETag from catalog.etag(). A client that sends
+# it back in If-None-Match gets an empty 304 instead of the body.
+
+CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "no-cache")
+
+
+def _opaque(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(request, response, etag):
+    """Set ETag / Cache-Control on `response`. Returns a 304 response when
+    the client's If-None-Match already names `etag`, else None."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+
+    tags = if_none_match.split(",")
+    if any(t.strip() == "*" or _opaque(t) == _opaque(etag) for t in tags):
+        return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,323 @@
+from database_async import (
+    bookings_col,
+    center_daily_col,
+    centers_col,
+    reports_center_daily_col,
+    rollup_failures_col,
+    rollup_state_col,
+)
+from datetime import timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# ---------------- CENTER DAILY ROLLUPS ----------------
+# One doc per (center_id, day) in center_daily_stats with running totals.
+# The booking write paths $inc it, so /admin/center_stats reads
+# centers x days rows instead of grouping the whole bookings collection.
+#
+# "day" is the unix timestamp of local midnight. The admin app sends
+# local-midnight start_ts/end_ts, so STATS_UTC_OFFSET_MINUTES must match
+# its timezone (default IST).
+
+DAY = 86400
+UTC_OFFSET = int(os.getenv("STATS_UTC_OFFSET_MINUTES", "330")) * 60
+TIMEZONE = "{}{:02d}:{:02d}".format("-" if UTC_OFFSET < 0 else "+", abs(UTC_OFFSET) // 3600, abs(UTC_OFFSET) % 3600 // 60)
+
+GRANULARITIES = ("day", "week", "month")
+
+log = logging.getLogger("se_booking.rollups")
+
+FIELDS = [
+    "bookings",
+    "revenue",
+    "paid_count",
+    "unpaid_count",
+    "partial_count",
+    "agent_collected",
+    "center_collected",
+    "admin_collected",
+]
+
+STATUS_FIELDS = {
+    "Paid": "paid_count",
+    "Unpaid": "unpaid_count",
+    "Partial": "partial_count",
+}
+
+
+def day_of(ts):
+    return ts - (ts + UTC_OFFSET) % DAY
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _contribution(b):
+    """What one booking adds to its (center_id, day) row."""
+    if not b:
+        return {}
+
+    c = {
+        "bookings": 1,
+        "revenue": _number(b.get("price")),
+        "agent_collected": _number(b.get("agent_collected")),
+        "center_collected": _number(b.get("center_collected")),
+        "admin_collected": _number(b.get("admin_collected")),
+    }
+    status_field = STATUS_FIELDS.get(b.get("payment_status"))
+    if status_field:
+        c[status_field] = 1
+    return c
+
+
+def _delta(before, after):
+    old, new = _contribution(before), _contribution(after)
+    delta = {}
+    for field in FIELDS:
+        diff = new.get(field, 0) - old.get(field, 0)
+        if diff:
+            delta[field] = diff
+    return delta
+
+
+def _key(b):
+    return {"center_id": b.get("center_id"), "day": day_of(int(b.get("created_at") or 0))}
+
+
+# The booking itself is already written when these run, so a failed $inc
+# is not raised to the client (a retry would book twice). It is queued in
+# rollup_failures for `python rollups.py --replay`, or logged when even
+# that fails, in which case `--rebuild` is the repair.
+
+async def _failed(rows, error):
+    if not rows:
+        return
+    log.error("center_daily_stats $inc failed, queued for replay: %s %s", rows, error)
+    try:
+        await rollup_failures_col.insert_many(
+            [{"key": key, "inc": inc, "at": int(time.time())} for key, inc in rows]
+        )
+    except PyMongoError as e:
+        log.error("rollup delta not queued, run rollups.py --rebuild: %s", e)
+
+
+async def record(before, after):
+    """Apply the change from `before` to `after` (either may be None)."""
+    b = after or before
+    delta = _delta(before, after)
+    if delta:
+        try:
+            await center_daily_col.update_one(_key(b), {"$inc": delta}, upsert=True)
+        except PyMongoError as e:
+            await _failed([(_key(b), delta)], e)
+
+
+async def record_many(bookings):
+    """Add newly inserted bookings, one $inc per (center_id, day)."""
+    rows = {}
+    for b in bookings:
+        key = _key(b)
+        row = rows.setdefault((repr(key["center_id"]), key["day"]), (key, {}))[1]
+        for field, value in _contribution(b).items():
+            row[field] = row.get(field, 0) + value
+
+    if rows:
+        rows = list(rows.values())
+        try:
+            await center_daily_col.bulk_write(
+                [UpdateOne(key, {"$inc": inc}, upsert=True) for key, inc in rows],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            # Unordered: the other rows were applied
+            await _failed([rows[err["index"]] for err in e.details["writeErrors"]], e)
+        except PyMongoError as e:
+            await _failed(rows, e)
+
+
+async def replay():
+    """Apply the queued deltas of failed record() / record_many() calls."""
+    replayed = 0
+    async for failure in rollup_failures_col.find({}).sort("at", 1):
+        await center_daily_col.update_one(failure["key"], {"$inc": failure["inc"]}, upsert=True)
+        await rollup_failures_col.delete_one({"_id": failure["_id"]})
+        replayed += 1
+    return replayed
+
+
+def _window(start_ts, end_ts):
+    if start_ts is not None and end_ts is not None:
+        return [{"$match": {"day": {"$gte": day_of(start_ts), "$lte": end_ts}}}]
+    return []
+
+
+async def center_totals(start_ts=None, end_ts=None):
+    """Sum the rollup rows per center, optionally for the days in a window."""
+    pipeline = _window(start_ts, end_ts)
+
+    pipeline.append({
+        "$group": {"_id": "$center_id", **{f: {"$sum": f"${f}"} for f in FIELDS}}
+    })
+
+    cursor = await reports_center_daily_col.aggregate(pipeline)
+    return await cursor.to_list(None)
+
+
+async def center_series(granularity, start_ts=None, end_ts=None):
+    """Per-center time series bucketed by day / week / month.
+
+    One aggregation: rollup rows -> $dateTrunc buckets -> one row per
+    center with its series, center_name joined by $lookup.
+    """
+    bucket = {"$dateTrunc": {
+        "date": {"$toDate": {"$multiply": ["$day", 1000]}},
+        "unit": granularity,
+        "timezone": TIMEZONE,
+        "startOfWeek": "monday",
+    }}
+
+    pipeline = _window(start_ts, end_ts) + [
+        {"$group": {
+            "_id": {"center_id": "$center_id", "bucket": bucket},
+            **{f: {"$sum": f"${f}"} for f in FIELDS},
+        }},
+        {"$group": {
+            "_id": "$_id.center_id",
+            "series": {"$push": {"bucket": "$_id.bucket", **{f: f"${f}" for f in FIELDS}}},
+        }},
+        # Old bookings may carry center_id as a string
+        {"$lookup": {
+            "from": centers_col.name,
+            "let": {"cid": {"$convert": {"input": "$_id", "to": "int", "onError": None, "onNull": None}}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$cid"]}}},
+                {"$project": {"_id": 0, "center_name": 1}},
+                {"$limit": 1},
+            ],
+            "as": "center",
+        }},
+    ]
+
+    cursor = await reports_center_daily_col.aggregate(pipeline)
+    rows = await cursor.to_list(None)
+
+    for row in rows:
+        for point in row["series"]:
+            point["bucket"] = int(point["bucket"].replace(tzinfo=timezone.utc).timestamp())
+        row["series"].sort(key=lambda point: point["bucket"])
+    return rows
+
+
+async def rebuild():
+    """Recompute every rollup row from bookings (backfill / repair)."""
+    started_at = int(time.time())
+    day = {"$subtract": [
+        "$created_at",
+        {"$mod": [{"$add": ["$created_at", UTC_OFFSET]}, DAY]}
+    ]}
+
+    def status_count(status):
+        return {"$sum": {"$cond": [{"$eq": ["$payment_status", status]}, 1, 0]}}
+
+    def number(field):
+        return {"$sum": {"$cond": [{"$isNumber": f"${field}"}, f"${field}", 0]}}
+
+    pipeline = [
+        {"$group": {
+            "_id": {"center_id": "$center_id", "day": day},
+            "bookings": {"$sum": 1},
+            "revenue": number("price"),
+            "paid_count": status_count("Paid"),
+            "unpaid_count": status_count("Unpaid"),
+            "partial_count": status_count("Partial"),
+            "agent_collected": number("agent_collected"),
+            "center_collected": number("center_collected"),
+            "admin_collected": number("admin_collected"),
+        }},
+        {"$project": {
+            "_id": 0,
+            "center_id": "$_id.center_id",
+            "day": "$_id.day",
+            **{f: 1 for f in FIELDS},
+        }},
+        # $out swaps the collection in one step and keeps its indexes
+        {"$out": center_daily_col.name},
+    ]
+    cursor = await bookings_col.aggregate(pipeline)
+    await cursor.to_list(None)
+    # Counted from the bookings now
+    await rollup_failures_col.delete_many({"at": {"$lt": started_at}})
+
+
+# ---------------- BACKFILL ----------------
+# rebuild() ends in $out, which replaces the collection and drops any $inc
+# the write paths made while it ran. So the first backfill runs before the
+# process serves: the app lifespan awaits ensure_backfilled() (see
+# warmup.backfill_rollups), and serve.py runs `python rollups.py --backfill`
+# once before forking so its workers find it done. A lock document in
+# rollup_state lets one process build while the others wait.
+# /admin/center_stats answers 503 until the backfill is done.
+
+STATE_ID = "center_daily_stats"
+# A build that started this long ago is taken to have crashed
+BACKFILL_STALE_S = int(os.getenv("STATS_BACKFILL_STALE_S", "3600"))
+
+_backfilled = False
+
+
+async def backfilled():
+    """Whether center_daily_stats is complete, i.e. safe to report from."""
+    global _backfilled
+    if not _backfilled:
+        # Only a finished build is cached; no state document (a deployment
+        # from before the lock) means it has to be built
+        state = await rollup_state_col.find_one({"_id": STATE_ID})
+        _backfilled = bool(state and state.get("done"))
+    return _backfilled
+
+
+async def _claim():
+    now = int(time.time())
+    try:
+        await rollup_state_col.insert_one({"_id": STATE_ID, "done": False, "started_at": now})
+        return True
+    except DuplicateKeyError:
+        taken = await rollup_state_col.find_one_and_update(
+            {"_id": STATE_ID, "done": False, "started_at": {"$lt": now - BACKFILL_STALE_S}},
+            {"$set": {"started_at": now}}
+        )
+        return taken is not None
+
+
+async def ensure_backfilled(poll_s=2):
+    """Build the rollups once, or wait for the process that is building them."""
+    while not await backfilled():
+        if await _claim():
+            await rebuild()
+            await rollup_state_col.update_one(
+                {"_id": STATE_ID}, {"$set": {"done": True, "finished_at": int(time.time())}}
+            )
+        else:
+            await asyncio.sleep(poll_s)
+
+
+if __name__ == "__main__":
+    # python rollups.py --backfill   -> build once if needed (serve.py runs this)
+    # python rollups.py --replay     -> apply the deltas queued by failed writes
+    # python rollups.py --rebuild    -> recompute everything; stop writes first,
+    #                                   increments made meanwhile are lost
+    if "--backfill" in sys.argv:
+        asyncio.run(ensure_backfilled())
+        print("center_daily_stats backfilled")
+    elif "--replay" in sys.argv:
+        print(f"center_daily_stats: replayed {asyncio.run(replay())} queued deltas")
+    elif "--rebuild" in sys.argv:
+        asyncio.run(rebuild())
+        print("center_daily_stats rebuilt")
@@ -0,0 +1,65 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Any, List, Optional, Union
+
+# ---------------- RESPONSE MODELS ----------------
+# Types of the list endpoints, for the OpenAPI docs (main._documented);
+# responses are not validated against them. Old documents mix ints and
+# strings for ids, mobile numbers and amounts, so those fields accept both.
+
+Number = Union[int, float]
+Id = Union[int, str]
+
+
+class AdminBooking(BaseModel):
+    booking_id: str
+    patient_name: Optional[str] = None
+    mobile: Optional[Union[str, int]] = None
+    age: Any = None
+    gender: Optional[str] = None
+    address: Optional[str] = None
+    test_name: str = ""
+    center_name: str = ""
+    status: Optional[str] = None
+    created_at: Optional[int] = None
+    booked_by: Optional[str] = None
+    payment_status: Optional[str] = None
+    payment_updated_by: Optional[str] = None
+    payment_updated_at: Optional[int] = None
+    agent_collected: Optional[Number] = 0
+    center_collected: Optional[Number] = 0
+    admin_collected: Optional[Number] = 0
+    price: Optional[Union[Number, str]] = 0
+
+
+class CenterBooking(BaseModel):
+    booking_id: Optional[str] = None
+    patient_name: Optional[str] = None
+    test_name: str = ""
+    price: Optional[Union[Number, str]] = None
+    status: Optional[str] = None
+    created_at: Optional[int] = None
+    booked_by: Optional[str] = None
+    payment_status: Optional[str] = None
+    payment_updated_by: Optional[str] = None
+    agent_collected: Optional[Number] = 0
+    center_collected: Optional[Number] = 0
+
+
+class Center(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: Id
+    center_name: Optional[str] = None
+    address: Optional[str] = None
+    lat: Optional[Number] = None
+    lng: Optional[Number] = None
+    timings: Optional[List[Any]] = None
+    enabled: Optional[bool] = None
+
+
+class Test(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: Id
+    category_id: Optional[Id] = None
+    test_name: Optional[str] = None
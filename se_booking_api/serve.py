@@ -0,0 +1,200 @@
+import glob
+import math
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+
+# ---------------- PRODUCTION SERVER ----------------
+# python serve.py
+#
+# gunicorn master with one uvicorn worker per available core:
+#
+#   WEB_CONCURRENCY           workers (default: cores from the cgroup CPU quota)
+#   HOST / PORT               bind address (0.0.0.0:8000)
+#   MONGO_CONNECTION_BUDGET   Mongo connections this container may open in
+#                             total; split into MONGO_MAX_POOL_SIZE per
+#                             worker unless that is set explicitly; each
+#                             worker opens MONGO_MIN_POOL_SIZE (default
+#                             min(4, pool)) of them during warmup
+#   SERVE_PRELOAD             import the app once in the master before
+#                             forking (default 1), so a broken build fails
+#                             before any worker starts
+#   SERVE_GRACEFUL_TIMEOUT    seconds a stopping worker gets to finish its
+#                             in-flight requests (default 30)
+#   SERVE_MAX_REQUESTS        recycle a worker after this many requests (0 = never)
+#   SERVE_BACKFILL            build the stats rollups before any worker
+#                             starts (default 1); otherwise the first
+#                             worker up builds them while the rest wait
+#                             (see rollups.py)
+#   AUTH_SECRET               token signing key; generated for this server's
+#                             workers when unset (tokens then end with a
+#                             restart). Required with AUTH_REQUIRED=1
+#   METRICS_DIR               directory the workers share /metrics values
+#                             through (default: a new temporary directory;
+#                             emptied at start, see metrics.py)
+#   WORKER_ID                 first booking-id worker slot (default 0); the
+#                             workers take WORKER_ID .. WORKER_ID + 2 x workers - 1
+#                             (old and new during a SIGHUP reload), so
+#                             containers sharing a database need disjoint
+#                             ranges within 0..31 (see ids.py)
+#
+# SIGHUP starts fresh workers and drains the old ones; SIGTERM drains and
+# exits. Docker's default stop timeout is 10s, so run with
+# `docker stop -t` >= SERVE_GRACEFUL_TIMEOUT.
+#
+# Where gunicorn is not available (Windows) it falls back to a single
+# uvicorn process: uvicorn's process manager has no hook to give its
+# workers distinct booking-id slots.
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+PRELOAD = os.getenv("SERVE_PRELOAD", "1") == "1"
+GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "0"))
+BACKFILL = os.getenv("SERVE_BACKFILL", "1") == "1"
+CONNECTION_BUDGET = int(os.getenv("MONGO_CONNECTION_BUDGET", "400"))
+
+# Each client also keeps monitoring sockets to every server outside its pool
+MONITOR_CONNECTIONS = 2
+
+# Pooled connections a worker opens before /ready (warmup.py)
+WARM_CONNECTIONS = 4
+
+# ids.MAX_WORKER, without importing the app into the master
+MAX_WORKER_ID = 31
+
+
+def available_cores():
+    """CPU quota of the container (cgroup v2 / v1), else usable CPUs."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count():
+    return int(os.getenv("WEB_CONCURRENCY", "0")) or available_cores()
+
+
+def pool_size(workers, budget=CONNECTION_BUDGET):
+    return max(1, budget // workers - MONITOR_CONNECTIONS)
+
+
+# ---------------- GUNICORN HOOKS ----------------
+# Booking ids embed a worker id (ids.py). With preload every worker would
+# inherit the master's, so each gets a free slot, offset by WORKER_ID for
+# containers sharing a database. While SIGHUP replaces workers the old
+# and new ones run side by side, so up to 2 x workers slots are in use.
+
+def pre_fork(server, worker):
+    used = {w.id_slot for w in server.WORKERS.values() if hasattr(w, "id_slot")}
+    worker.id_slot = next(slot for slot in range(len(used) + 1) if slot not in used)
+
+
+def post_fork(server, worker):
+    import ids
+    ids.WORKER_ID = (int(os.getenv("WORKER_ID", "0")) + worker.id_slot) & ids.MAX_WORKER
+
+
+def main():
+    workers = worker_count()
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+        if workers > 1:
+            print(f"warning: gunicorn is not installed; serving with 1 worker instead of {workers}",
+                  file=sys.stderr, flush=True)
+            workers = 1
+
+    first_slot = int(os.getenv("WORKER_ID", "0"))
+    if first_slot < 0 or first_slot + 2 * workers - 1 > MAX_WORKER_ID:
+        # Slots wrap around and clash; the id retries in main.py cover it
+        print(f"warning: WORKER_ID {first_slot} with {workers} workers does not fit in "
+              f"0..{MAX_WORKER_ID}; booking ids will be retried on clashes", file=sys.stderr, flush=True)
+
+    os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(pool_size(workers)))
+    os.environ.setdefault("MONGO_MIN_POOL_SIZE", str(min(WARM_CONNECTIONS, int(os.environ["MONGO_MAX_POOL_SIZE"]))))
+
+    # Exported before forking, so every worker signs and verifies with the
+    # same key. With AUTH_REQUIRED=1 auth.py refuses to start without one:
+    # containers behind one load balancer have to share it
+    if not os.getenv("AUTH_SECRET") and os.getenv("AUTH_REQUIRED", "0") != "1":
+        os.environ["AUTH_SECRET"] = secrets.token_hex(32)
+        print("warning: AUTH_SECRET not set; tokens stop verifying when this server restarts",
+              file=sys.stderr, flush=True)
+
+    # In a child process: the master must not own a Mongo client its
+    # workers would inherit
+    if BACKFILL:
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+        subprocess.run([sys.executable, os.path.join(app_dir, "rollups.py"), "--backfill"], cwd=app_dir, check=True)
+
+    # /metrics sums the workers' values from here; a fresh start is a
+    # counter reset for Prometheus
+    if os.getenv("METRICS_DIR"):
+        for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.json")):
+            os.remove(path)
+    else:
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="se_booking_metrics_")
+
+    print(f"serving on {HOST}:{PORT} with {workers} workers, "
+          f"MONGO_MAX_POOL_SIZE={os.environ['MONGO_MAX_POOL_SIZE']}, "
+          f"MONGO_MIN_POOL_SIZE={os.environ['MONGO_MIN_POOL_SIZE']}", flush=True)
+
+    if BaseApplication is None:
+        import uvicorn
+        os.environ.setdefault("WORKER_ID", "0")
+        uvicorn.run(
+            "main:app", host=HOST, port=PORT,
+            timeout_graceful_shutdown=GRACEFUL_TIMEOUT
+        )
+        return
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{HOST}:{PORT}",
+                "workers": workers,
+                "worker_class": "uvicorn_worker.UvicornWorker",
+                "preload_app": PRELOAD,
+                "graceful_timeout": GRACEFUL_TIMEOUT,
+                "timeout": 60,
+                "keepalive": 5,
+                "max_requests": MAX_REQUESTS,
+                "max_requests_jitter": MAX_REQUESTS // 10,
+                "pre_fork": pre_fork,
+                "post_fork": post_fork,
+                "accesslog": "-" if os.getenv("SERVE_ACCESS_LOG") == "1" else None,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    Server().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from fastapi.responses import StreamingResponse
+from joins import resolve_names
+from responses import dumps
+
+import os
+
+NDJSON = "application/x-ndjson"
+
+# Docs pulled from Mongo per getMore and written out per batch
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+
+def wants_stream(request, stream):
+    """True if the caller asked for NDJSON via ?stream=1 or the Accept header."""
+    return stream == 1 or NDJSON in request.headers.get("accept", "")
+
+
+async def _lines(batch, build_row):
+    test_names, center_names = await resolve_names()
+    return b"".join(
+        dumps(build_row(b, test_names, center_names)) + b"\n" for b in batch
+    )
+
+
+async def _iter_ndjson(cursor, build_row):
+    batch = []
+    async for b in cursor.batch_size(STREAM_BATCH_SIZE):
+        batch.append(b)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield await _lines(batch, build_row)
+            batch = []
+    if batch:
+        yield await _lines(batch, build_row)
+
+
+def ndjson_response(cursor, build_row):
+    """Stream one enriched booking per line while the cursor is read.
+
+    build_row(booking, test_names, center_names) -> dict
+    """
+    return StreamingResponse(_iter_ndjson(cursor, build_row), media_type=NDJSON)
@@ -0,0 +1,25 @@
+from pymongo import MongoClient
+
+import os
+import pytest
+import sys
+
+# The app imports its modules by bare name (run from se_booking_api/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AUTH_SECRET", "test-secret")
+
+# Tests that need MongoDB run when MONGO_URL is set, against a database
+# they drop afterwards
+os.environ["MONGO_DB"] = os.getenv("TEST_MONGO_DB", "se_booking_test")
+
+
+@pytest.fixture
+def mongo_db():
+    if not os.getenv("MONGO_URL"):
+        pytest.skip("MONGO_URL not set")
+    client = MongoClient(os.environ["MONGO_URL"])
+    client.drop_database(os.environ["MONGO_DB"])
+    yield client[os.environ["MONGO_DB"]]
+    client.drop_database(os.environ["MONGO_DB"])
+    client.close()
@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+import catalog
+import main
+import responses
+
+client = TestClient(main.app)
+
+
+def test_admin_pricing_rejects_negative_paging():
+    assert client.get("/admin/pricing", params={"center_id": 1, "offset": -5}).status_code == 422
+    assert client.get("/admin/pricing", params={"center_id": 1, "limit": 0}).status_code == 422
+
+
+def test_cors_exposes_total_count():
+    res = client.get("/", headers={"Origin": "https://example.netlify.app"})
+    assert "x-total-count" in res.headers["access-control-expose-headers"].lower()
+
+
+def test_plain_json_path_returns_legacy_rows(monkeypatch):
+    async def centers():
+        return [{"id": "7", "center_name": None, "lat": "12.9", "timings": "9-5"}]
+
+    monkeypatch.setattr(responses, "FAST_JSON", False)
+    monkeypatch.setattr(catalog, "centers", centers)
+    res = client.get("/admin/centers")
+    assert res.status_code == 200
+    assert res.json() == [{"id": "7", "center_name": None, "lat": "12.9", "timings": "9-5"}]
+
+
+def test_list_models_stay_in_the_openapi_docs():
+    schema = client.get("/openapi.json").json()
+    ok = schema["paths"]["/admin/bookings"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert ok["items"]["$ref"].endswith("/AdminBooking")
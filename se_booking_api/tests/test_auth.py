@@ -0,0 +1,86 @@
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import asyncio
+import os
+import pytest
+import subprocess
+import sys
+
+import auth
+import main
+
+client = TestClient(main.app)
+
+
+def test_token_round_trip():
+    claims = auth.verify_token(auth.issue_token("center", "c1", center_id=7))
+    assert claims["role"] == "center"
+    assert claims["center_id"] == 7
+
+
+def test_tampered_token_is_rejected():
+    payload, signature = auth.issue_token("agent", "a1").split(".")
+    forged = signature[:-1] + ("B" if signature.endswith("A") else "A")
+    assert auth.verify_token(f"{payload}.{forged}") is None
+    assert auth.verify_token("no-dot") is None
+
+
+def test_non_ascii_signature_is_rejected():
+    assert auth.verify_token("a.é") is None
+
+
+def test_non_ascii_bearer_header_is_not_a_server_error():
+    res = client.get("/", headers={"Authorization": "Bearer a.é".encode("latin-1")})
+    assert res.status_code == 200
+
+
+def _bearer(role, subject, **claims):
+    return {"Authorization": "Bearer " + auth.issue_token(role, subject, **claims)}
+
+
+def test_center_token_cannot_read_another_centers_bookings():
+    res = client.get("/center/bookings", params={"center_id": 2}, headers=_bearer("center", "c1", center_id=1))
+    assert res.status_code == 403
+
+
+def test_agent_token_cannot_read_another_agents_bookings():
+    res = client.get("/agent/bookings", params={"agent_name": "Other"},
+                     headers=_bearer("agent", "a1", agent_id="x", agent_name="Mine"))
+    assert res.status_code == 403
+
+
+def _request(claims):
+    from starlette.requests import Request
+    return Request({"type": "http", "state": {"auth": claims}})
+
+
+def test_booking_filter_limits_center_and_agent_tokens():
+    assert auth.booking_filter(_request({"role": "center", "center_id": "5"})) == {
+        "center_id": {"$in": ["5", 5]}
+    }
+    assert auth.booking_filter(_request({"role": "agent", "agent_name": "Mine"})) == {"booked_by": "Mine"}
+    assert auth.booking_filter(_request({"role": "admin"})) == {}
+    assert auth.booking_filter(_request(None)) == {}
+
+
+def test_own_center_and_admin_pass_the_checks():
+    auth.check_center(_request({"role": "center", "center_id": 1}), 1)
+    auth.check_center(_request({"role": "admin"}), 2)
+    auth.check_agent(_request({"role": "agent", "agent_name": "Mine"}), "Mine")
+
+
+def test_non_string_password_is_a_bad_request():
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main._hash_password(1234))
+    assert e.value.status_code == 400
+    assert auth.verify_password(auth.hash_password("pw"), 1234) is False
+
+
+def test_auth_required_without_secret_fails_at_import():
+    env = {k: v for k, v in os.environ.items() if k != "AUTH_SECRET"}
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, "-c", "import auth"], cwd=app_dir, capture_output=True, text=True,
+                          env={**env, "AUTH_REQUIRED": "1"})
+    assert proc.returncode != 0
+    assert "AUTH_SECRET must be set" in proc.stderr
@@ -0,0 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ASCENDING
+
+import asyncio
+import httpx
+import os
+import subprocess
+import sys
+
+import ids
+
+THREADS = 8
+PER_THREAD = 20000
+
+
+def _burst(n):
+    return [ids.next_id() for _ in range(n)]
+
+
+def test_threads_get_unique_increasing_ids():
+    with ThreadPoolExecutor(THREADS) as pool:
+        batches = list(pool.map(_burst, [PER_THREAD] * THREADS))
+
+    generated = [i for batch in batches for i in batch]
+    assert len(set(generated)) == len(generated)
+    for batch in batches:
+        assert all(a < b for a, b in zip(batch, batch[1:]))
+    assert max(generated) < 2 ** 53
+
+
+def test_workers_with_different_worker_ids_do_not_clash():
+    code = "import ids; print('\\n'.join(str(ids.next_id()) for _ in range(50000)))"
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    procs = [
+        subprocess.Popen([sys.executable, "-c", code], cwd=app_dir, stdout=subprocess.PIPE, text=True,
+                         env={**os.environ, "WORKER_ID": str(worker)})
+        for worker in (1, 2, 3)
+    ]
+    generated = [line for p in procs for line in p.communicate()[0].split()]
+    assert len(generated) == 150000
+    assert len(set(generated)) == len(generated)
+
+
+def test_concurrent_inserts_into_unique_index(mongo_db):
+    mongo_db.ids.create_index([("id", ASCENDING)], unique=True)
+
+    def insert(_):
+        for _ in range(20):
+            mongo_db.ids.insert_many([{"id": i} for i in _burst(100)], ordered=False)
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(insert, range(THREADS)))
+
+    assert mongo_db.ids.count_documents({}) == THREADS * 2000
+
+
+def test_add_booking_burst(mongo_db):
+    import indexes
+    import main
+
+    count = 2000
+    booking = {"name": "P", "mobile": "9", "center_id": 1, "test_id": 1, "price": 100}
+
+    async def burst():
+        await indexes.ensure_indexes()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/add_booking", json=booking) for _ in range(count)))
+
+    responses = asyncio.run(burst())
+
+    assert all(r.status_code == 200 for r in responses)
+    booking_ids = {r.json()["booking_id"] for r in responses}
+    assert len(booking_ids) == count
+    assert mongo_db.bookings.count_documents({}) == count
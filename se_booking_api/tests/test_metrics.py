@@ -0,0 +1,40 @@
+import json
+import os
+
+import metrics
+
+
+def _other_worker(tmp_path, pid, requests, in_flight):
+    data = {"pid": pid, "metrics": {
+        "http_requests_total": [[["GET", "/", 200], requests]],
+        "http_requests_in_flight": [[["GET", "/"], in_flight]],
+    }}
+    (tmp_path / f"{pid}-1.json").write_text(json.dumps(data))
+
+
+def test_render_sums_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_file", None)
+    monkeypatch.setattr(metrics.requests_total, "values", {("GET", "/", 200): 2})
+    monkeypatch.setattr(metrics.in_flight, "values", {("GET", "/"): 1})
+
+    # os.getppid() is alive; a pid above pid_max never is
+    _other_worker(tmp_path, os.getppid(), 3, 4)
+    _other_worker(tmp_path, 2 ** 30, 5, 6)
+
+    text = metrics.render()
+    assert 'http_requests_total{method="GET",route="/",status="200"} 10' in text
+    # the exited worker's gauge is dropped, its counter kept
+    assert 'http_requests_in_flight{method="GET",route="/"} 5' in text
+
+
+def test_snapshot_without_gauges(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "_file", None)
+    monkeypatch.setattr(metrics.in_flight, "values", {("GET", "/"): 1})
+
+    metrics.write_snapshot(gauges=False)
+    [path] = tmp_path.glob("*.json")
+    saved = json.loads(path.read_text())["metrics"]
+    assert "http_requests_in_flight" not in saved
+    assert "http_requests_total" in saved
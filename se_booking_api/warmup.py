@@ -0,0 +1,87 @@
+from database_async import client, reports_db
+
+import asyncio
+import catalog
+import indexes
+import logging
+import os
+import rollups
+
+log = logging.getLogger("se_booking.warmup")
+
+# ---------------- WARMUP ----------------
+# Runs in the background once the worker is up (see lifespan in main.py):
+#
+#   1. opens MONGO_MIN_POOL_SIZE pooled connections (at least one), plus
+#      one to the server report reads go to
+#   2. creates missing indexes; a unique index that can't be built (duplicate
+#      ids in the data) fails warmup, so the worker never turns ready
+#      without it (the stats rollups are backfilled before the worker
+#      serves at all, see backfill_rollups)
+#   3. loads the catalog and starts its change stream
+#   4. logs any PLAN_CHECKS query that would scan a whole collection
+#      (WARMUP_VERIFY_PLANS=0 skips this)
+#
+# /ready answers 503 until it has finished, so a load balancer only sends
+# traffic to warm workers. A step that fails (e.g. Mongo not reachable
+# yet) is retried from the start every WARMUP_RETRY_S seconds; /ready
+# reports the last failure meanwhile.
+
+VERIFY_PLANS = os.getenv("WARMUP_VERIFY_PLANS", "1") == "1"
+RETRY_S = float(os.getenv("WARMUP_RETRY_S", "5"))
+
+READY = False
+ERROR = None
+
+
+async def open_connections():
+    # Concurrent commands each check out their own connection; pymongo
+    # keeps the pool at minPoolSize afterwards
+    count = max(1, client.options.pool_options.min_pool_size)
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(count)))
+    await reports_db.command("ping", read_preference=reports_db.read_preference)
+    return count
+
+
+async def _verify_plans():
+    try:
+        failures = await indexes.verify_query_plans()
+    except Exception as e:
+        log.warning("warmup: query plan check failed: %s", e)
+        return
+    for name in failures:
+        log.warning("warmup: %s runs as a collection scan", name)
+
+
+async def backfill_rollups():
+    """Build the stats rollups if no process has yet (awaited by the lifespan
+    before serving, see rollups.py). Retried until Mongo answers."""
+    while True:
+        try:
+            await rollups.ensure_backfilled()
+            return
+        except Exception as e:
+            log.warning("rollup backfill failed, retrying in %ss: %s", RETRY_S, e)
+            await asyncio.sleep(RETRY_S)
+
+
+async def run():
+    global READY, ERROR
+    while True:
+        try:
+            start = asyncio.get_running_loop().time()
+            connections = await open_connections()
+            await indexes.ensure_indexes()
+            await catalog.start_watcher()
+            await catalog.load_all()
+            if VERIFY_PLANS:
+                await _verify_plans()
+            break
+        except Exception as e:
+            ERROR = f"warmup failed: {e}"
+            log.warning("warmup failed, retrying in %ss: %s", RETRY_S, e)
+            await asyncio.sleep(RETRY_S)
+
+    ERROR = None
+    READY = True
+    log.info("warm after %.1fs with %d connections", asyncio.get_running_loop().time() - start, connections)